@@ -0,0 +1,64 @@
+"""Wall-clock time of compiling many pipelines serially and in processes.
+
+Run with ``python -m benchmarks.compile [PIPELINES] [JOBS]``.
+"""
+
+import os
+import sys
+import time
+from kfp import dsl
+from data_baits.bait import BaitRegistry
+from data_baits.baits import Pipeline
+from data_baits.generate import compile_stream
+
+PIPELINES = 40
+
+
+@dsl.component(base_image="python:3.12")
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+@dsl.pipeline(name="bench-compile")
+def chain(a: int = 1, b: int = 2):
+    result = add(a=a, b=b)
+    for _ in range(10):
+        result = add(a=result.output, b=b)
+
+
+def synthetic_baits(pipelines: int) -> list:
+    BaitRegistry().clear()
+    return [
+        (
+            Pipeline(
+                name=f"bench-compile-{i}",
+                destinations=["bench"],
+                kfp_pipeline=chain,
+            ),
+            ["bench"],
+        )
+        for i in range(pipelines)
+    ]
+
+
+def main():
+    pipelines = int(sys.argv[1]) if len(sys.argv) > 1 else PIPELINES
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    for label, n_jobs in [("serial", 1), (f"{jobs} jobs", jobs)]:
+        baits = synthetic_baits(pipelines)
+        start = time.perf_counter()
+        failed = [
+            bait
+            for bait, _, error in compile_stream(baits, jobs=n_jobs)
+            if error
+        ]
+        elapsed = time.perf_counter() - start
+        assert not failed
+        print(
+            f"{label:>10}: {pipelines} pipelines in {elapsed:6.2f} s "
+            f"({pipelines / elapsed:6.1f} pipelines/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Time of writing the generate output for one and many environments.
+
+Every bait targets all the environments, so with the serialization
+shared between them, many clusters should cost close to one. Run with
+``python -m benchmarks.emission [BAITS] [ENVIRONMENTS]``.
+"""
+
+import sys
+import tempfile
+import time
+from data_baits.bait import BaitRegistry
+from data_baits.baits import MySQLInternalDatabase
+from data_baits.generate import ManifestWriter
+
+BAITS = 500
+ENVIRONMENTS = 8
+
+
+def synthetic_baits(baits: int, environments: int) -> list:
+    destinations = [f"env-{i}" for i in range(environments)]
+    BaitRegistry().clear()
+    return [
+        MySQLInternalDatabase(name=f"bench-{i}", destinations=destinations)
+        for i in range(baits)
+    ]
+
+
+def main():
+    baits = int(sys.argv[1]) if len(sys.argv) > 1 else BAITS
+    environments = int(sys.argv[2]) if len(sys.argv) > 2 else ENVIRONMENTS
+    for n_environments in sorted({1, environments}):
+        all_baits = synthetic_baits(baits, n_environments)
+        with tempfile.TemporaryDirectory() as path:
+            for label in ["first run", "unchanged"]:
+                start = time.perf_counter()
+                writer = ManifestWriter(path)
+                for bait in all_baits:
+                    writer.add(bait, bait.destinations)
+                writer.close()
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{n_environments:>3} environment(s), {label:>9}: "
+                    f"{baits} baits in {elapsed:6.2f} s"
+                )
+
+
+if __name__ == "__main__":
+    main()
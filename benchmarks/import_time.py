@@ -0,0 +1,71 @@
+"""Import time of the CLI entry points.
+
+Runs the commands below with ``python -X importtime``, reports the
+slowest top-level imports and fails if the total import time of a
+command exceeds its threshold. Run with
+``python -m benchmarks.import_time [--top N] [--scale X]``.
+"""
+
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+
+# command -> total import time threshold in milliseconds
+COMMANDS = {
+    "--help": 1000,
+    "deploy --help": 3000,
+    "generate --help": 3000,
+}
+
+
+def import_times(args: list[str]) -> dict[str, float]:
+    """Returns the cumulative import time (ms) of the top-level packages."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "data_baits", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header
+        if name.startswith("  "):
+            continue  # nested import, counted by its parent
+        times[name.strip().split(".")[0]] += int(cumulative) / 1e3
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiplies the thresholds, e.g. for slow CI runners",
+    )
+    arguments = parser.parse_args()
+    failed = False
+    for command, threshold in COMMANDS.items():
+        times = import_times(command.split())
+        total = sum(times.values())
+        threshold *= arguments.scale
+        status = "OK" if total <= threshold else "REGRESSION"
+        failed |= total > threshold
+        print(
+            f"python -m data_baits {command}: {total:8.1f} ms "
+            f"(threshold {threshold:.0f} ms) {status}"
+        )
+        slowest = sorted(times.items(), key=lambda t: -t[1])
+        for name, elapsed in slowest[: arguments.top]:
+            print(f"    {elapsed:8.1f} ms  {name}")
+    sys.exit(int(failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Throughput of loading a directory of mixed bait manifests.
+
+Compares the type-discriminated loader against the previous approach,
+which parsed every non-Bait manifest twice. Run with
+``python -m benchmarks.manifests``.
+"""
+
+import importlib
+import os
+import tempfile
+import time
+from pydantic import ValidationError
+from pydantic_yaml import parse_yaml_raw_as
+from ruamel.yaml import YAML
+from data_baits.bait import Bait
+from data_baits.baits import (
+    MySQLInternalDatabase,
+    Pipeline,
+    SQLiteDatabase,
+    Trap,
+)
+
+MANIFESTS_PER_TYPE = 250
+REFERENCE = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "test",
+    "data_baits",
+    "ref",
+    "pipeline_with_inputs.yaml",
+)
+
+
+def legacy_yaml_to_bait(content: str) -> Bait:
+    try:
+        return parse_yaml_raw_as(Bait, content)
+    except ValidationError as e:
+        error = e.errors()[0]
+        requested_bait = getattr(
+            importlib.import_module("data_baits.baits"), error["input"]
+        )
+        return parse_yaml_raw_as(requested_bait, content)
+
+
+def source_manifests(prefix: str) -> list[str]:
+    with open(REFERENCE) as f:
+        definition = YAML(typ="safe").load(f)
+    manifests = []
+    for i in range(MANIFESTS_PER_TYPE):
+        common = {"name": f"{prefix}-{i}", "destinations": ["bench"]}
+        pipeline = Pipeline(**common)
+        pipeline.__setattr__("definition", definition, override=True)
+        for bait in [
+            Bait(**common),
+            Trap(**common, bait="some-bait", experiment="some-experiment"),
+            MySQLInternalDatabase(**common),
+            SQLiteDatabase(**common),
+            pipeline,
+        ]:
+            manifests.append(bait.dump_to_yaml_str())
+    return manifests
+
+
+def load_directory(path: str, loader) -> int:
+    loaded = 0
+    for file in sorted(os.listdir(path)):
+        with open(os.path.join(path, file)) as f:
+            loader(f.read())
+        loaded += 1
+    return loaded
+
+
+def main():
+    for label, prefix, loader in [
+        ("two-pass", "bench-legacy", legacy_yaml_to_bait),
+        ("discriminated", "bench-single", Bait.yaml_str_to_bait),
+    ]:
+        manifests = source_manifests(prefix)
+        with tempfile.TemporaryDirectory() as path:
+            for i, manifest in enumerate(manifests):
+                with open(os.path.join(path, f"{i}.yaml"), "w") as f:
+                    f.write(manifest.replace(prefix, f"{prefix}-loaded"))
+            start = time.perf_counter()
+            loaded = load_directory(path, loader)
+            elapsed = time.perf_counter() - start
+        print(
+            f"{label:>14}: {loaded} manifests in {elapsed:6.2f} s "
+            f"({loaded / elapsed:8.1f} manifests/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Planning a deployment of 10k baits against a registry snapshot.
+
+Compares the offline plan, which only reads the headers of the
+manifests, against validating every bait as deploy does before its diff.
+Run with ``python -m benchmarks.plan``.
+"""
+
+import time
+from data_baits.bait import Bait, BaitRegistry
+from data_baits.plan import (
+    _plan_entry,
+    deployed_versions,
+    make_plan,
+    select_baits,
+)
+
+BAITS_NO = 10_000
+
+
+def main():
+    with BaitRegistry.scope():
+        sources = [
+            (
+                f"bait-{i}",
+                Bait(
+                    name=f"bench-plan-{i % 2_500}",
+                    version=f"0.{i // 2_500}.0",
+                    destinations=["bench"],
+                ).dump_to_yaml_str(),
+            )
+            for i in range(BAITS_NO)
+        ]
+    registry_data = {
+        f"bait-bench-plan-{i}_0.1.0": "2024-01-01 00:00:00"
+        for i in range(2_500)
+    }
+
+    started = time.perf_counter()
+    with BaitRegistry.scope():
+        baits = list(Bait.load_many(sources, max_workers=1))
+        deployed = deployed_versions(registry_data)
+        validated = select_baits(
+            ((bait.id(False), bait.version, bait) for bait in baits),
+            deployed,
+        )
+    deploy_like = time.perf_counter() - started
+
+    started = time.perf_counter()
+    plan = make_plan(sources, registry_data)
+    planned = time.perf_counter() - started
+    assert [bait.id() for bait in validated] == [
+        bait["id"] for bait in plan["baits"]
+    ]
+
+    entries = [_plan_entry(label, manifest) for label, manifest in sources]
+    started = time.perf_counter()
+    select_baits(entries, deployed)
+    selected = time.perf_counter() - started
+
+    print(f"{BAITS_NO} baits, {len(plan['baits'])} to deploy")
+    print(f"validate + diff (deploy): {deploy_like * 1e3:10.2f} ms")
+    print(f"offline plan:             {planned * 1e3:10.2f} ms")
+    print(f"diff only:                {selected * 1e3:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
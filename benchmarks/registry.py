@@ -0,0 +1,50 @@
+"""Latest-version lookups in BaitRegistry.
+
+Compares the indexed registry against the previous linear scan.
+Run with ``python -m benchmarks.registry`` from the repository root.
+"""
+
+import timeit
+from packaging.version import Version
+from data_baits.bait import Bait, BaitRegistry
+
+BAITS_NO = 10_000
+VERSIONS_PER_NAME = 10
+
+
+def scan_get(registry: BaitRegistry, name: str) -> Bait:
+    # the lookup as it used to be implemented
+    latest_bait = None
+    for bait in registry.all().values():
+        if bait.name == name:
+            if not latest_bait:
+                latest_bait = bait
+            elif Version(str(bait.version)) > Version(
+                str(latest_bait.version)
+            ):
+                latest_bait = bait
+    return latest_bait
+
+
+def main():
+    names = [f"bench-bait-{i}" for i in range(BAITS_NO // VERSIONS_PER_NAME)]
+    for name in names:
+        for minor in range(VERSIONS_PER_NAME):
+            Bait(name=name, version=f"0.{minor}.0", destinations=["bench"])
+    registry = BaitRegistry()
+    probes = names[:: len(names) // 100]
+    assert all(scan_get(registry, n) is registry.get(n) for n in probes)
+    scan = timeit.timeit(
+        lambda: [scan_get(registry, n) for n in probes], number=1
+    )
+    indexed = timeit.timeit(
+        lambda: [registry.get(n) for n in probes], number=1
+    )
+    print(f"{len(registry.all())} baits, {len(probes)} lookups")
+    print(f"scan:    {scan * 1e3 / len(probes):10.4f} ms/lookup")
+    print(f"indexed: {indexed * 1e3 / len(probes):10.4f} ms/lookup")
+    print(f"speedup: {scan / indexed:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Dumping and loading bait manifests with each serialization backend.
+
+The compiled definition of the reference pipeline is scaled up by
+replicating its components. Run with ``python -m benchmarks.serialization``.
+"""
+
+import copy
+import os
+import time
+from data_baits.baits import Pipeline
+from data_baits.core.serialization import (
+    dump_manifest,
+    load_manifest,
+    load_yaml,
+)
+from data_baits.core.settings import ManifestFormats, YamlBackends
+
+SCALE = 50
+MANIFESTS_NO = 10
+REFERENCE = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "test",
+    "data_baits",
+    "ref",
+    "pipeline_with_inputs.yaml",
+)
+
+
+def scaled_definition() -> dict:
+    with open(REFERENCE) as f:
+        definition = load_yaml(f.read())
+    components = definition["components"]
+    executors = definition["deploymentSpec"]["executors"]
+    for i in range(SCALE):
+        for name, component in list(components.items())[:2]:
+            components[f"{name}-{i}"] = copy.deepcopy(component)
+        for name, executor in list(executors.items())[:2]:
+            executors[f"{name}-{i}"] = copy.deepcopy(executor)
+    return definition
+
+
+def main():
+    definition = scaled_definition()
+    baits = []
+    for i in range(MANIFESTS_NO):
+        pipeline = Pipeline(
+            name=f"bench-serialization-{i}", destinations=["b"]
+        )
+        pipeline.__setattr__("definition", definition, override=True)
+        baits.append(pipeline)
+    for label, manifest_format, backend in [
+        ("yaml (ruamel)", ManifestFormats.yaml, YamlBackends.ruamel),
+        ("yaml (libyaml)", ManifestFormats.yaml, YamlBackends.libyaml),
+        ("json", ManifestFormats.json, None),
+    ]:
+        start = time.perf_counter()
+        manifests = [
+            dump_manifest(bait, manifest_format, backend) for bait in baits
+        ]
+        dumped = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = [load_manifest(manifest, backend) for manifest in manifests]
+        load_time = time.perf_counter() - start
+        assert loaded[0]["definition"] == definition
+        size = sum(len(manifest) for manifest in manifests)
+        print(
+            f"{label:>15}: dump {dumped:6.3f} s, load {load_time:6.3f} s, "
+            f"{size / 2**20:6.2f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Size of the sources secret data with the available compressions.
+
+Reads the manifests of a sources secret written by generate, by default
+the one of the example. Run with
+``python -m benchmarks.sources_size [SOURCES_SECRET]``.
+"""
+
+import os
+import sys
+from data_baits.core.serialization import load_yaml
+from data_baits.core.settings import SourcesCompressions, settings
+from data_baits.sources import (
+    decode_sources,
+    encode_source,
+    shard_sources,
+    zstandard,
+)
+
+SOURCES_SECRET = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "example",
+    "manifests",
+    "example",
+    "sources_secret.yaml",
+)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else SOURCES_SECRET
+    with open(path) as f:
+        secret = load_yaml(f.read())
+    manifests = {
+        label.split("/", 1)[1]: manifest
+        for label, manifest, _ in decode_sources("sources", secret["data"])
+    }
+    print(f"{len(manifests)} manifests from '{path}'")
+    baseline = None
+    for compression in SourcesCompressions:
+        if compression == SourcesCompressions.zstd and zstandard is None:
+            print(f"{compression.value:>6}: skipped, no 'zstandard'")
+            continue
+        data = {}
+        for name, manifest in manifests.items():
+            data.update(
+                encode_source(
+                    name,
+                    manifest,
+                    compression=compression,
+                    max_entry_bytes=settings.SOURCES_SECRET_MAX_BYTES,
+                )
+            )
+        size = sum(len(name) + len(value) for name, value in data.items())
+        shards = shard_sources(data, settings.SOURCES_SECRET_MAX_BYTES)
+        baseline = baseline or size
+        print(
+            f"{compression.value:>6}: {size:>9} bytes "
+            f"({size / baseline:6.1%}) in {len(shards)} secret(s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
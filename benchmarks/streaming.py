@@ -0,0 +1,95 @@
+"""Peak memory of generate as the number of the baits grows.
+
+Compares collecting all the compiled baits before writing them with the
+streaming generate_manifests. Every configuration runs in a fresh
+process. Run with ``python -m benchmarks.streaming [BAITS ...]``.
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from data_baits.bait import BaitRegistry
+from data_baits.generate import (
+    ManifestWriter,
+    compile_stream,
+    generate_manifests,
+    iter_baits,
+)
+
+BAITS = [25, 50, 100]
+STEPS = 30
+GENERATOR = """
+from kfp import dsl
+from data_baits.baits import Pipeline
+
+
+@dsl.component(base_image="python:3.12")
+def step(a: int) -> int:
+    return a + 1
+
+
+@dsl.pipeline(name="bench")
+def chain(a: int = 1):
+    for _ in range({steps}):
+        a = step(a=a).output
+
+
+def generate():
+    return [
+        Pipeline(
+            name="bench-{index}",
+            destinations=["bench"],
+            kfp_pipeline=chain,
+        )
+    ]
+"""
+
+
+def run(mode: str, baits: int) -> None:
+    with tempfile.TemporaryDirectory() as path:
+        sources = os.path.join(path, "sources")
+        output = os.path.join(path, "output")
+        os.makedirs(sources)
+        os.makedirs(output)
+        for index in range(baits):
+            with open(os.path.join(sources, f"bench_{index}.py"), "w") as f:
+                f.write(GENERATOR.format(steps=STEPS, index=index))
+        with BaitRegistry.scope():
+            if mode == "collected":
+                baits = list(compile_stream(iter_baits([sources], ["bench"])))
+                writer = ManifestWriter(output)
+                for bait, envs, _ in baits:
+                    writer.add(bait, envs)
+                writer.close()
+            else:
+                generate_manifests([sources], ["bench"], output)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:>10}: {baits:>4} baits, peak RSS {peak:7.1f} MiB")
+
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        import logging
+
+        logging.disable(logging.INFO)
+        run(sys.argv[2], int(sys.argv[3]))
+        return
+    for baits in [int(arg) for arg in sys.argv[1:]] or BAITS:
+        for mode in ["collected", "streaming"]:
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.streaming",
+                    "--child",
+                    mode,
+                    str(baits),
+                ],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Sorting and comparing baits by version, as done by deploy.
+
+Compares the cached version key against constructing a Version on
+every access. Run with ``python -m benchmarks.versions``.
+"""
+
+import random
+import timeit
+from packaging.version import Version
+from data_baits.bait import Bait
+
+BAITS_NO = 50_000
+
+
+def deploy_like(baits, deployed_names, version_of):
+    newer = 0
+    for bait in sorted(baits, key=version_of):
+        deployed = deployed_names.get(bait.name)
+        if deployed is None or version_of(bait) > deployed:
+            newer += 1
+    return newer
+
+
+def main():
+    baits = [
+        Bait(
+            name=f"bench-version-{i % 5_000}",
+            version=f"{i // 5_000}.{random.randint(0, 99)}.{i}",
+            destinations=["bench"],
+        )
+        for i in range(BAITS_NO)
+    ]
+    deployed_names = {
+        f"bench-version-{i}": Version(f"5.0.{i}") for i in range(5_000)
+    }
+
+    def per_access(bait):
+        # the previous behaviour of GenericBait.version
+        return Version(bait.__dict__["version"])
+
+    def cached(bait):
+        return bait.version_key
+
+    assert deploy_like(baits, deployed_names, per_access) == deploy_like(
+        baits, deployed_names, cached
+    )
+    runs = 3
+    before = timeit.timeit(
+        lambda: deploy_like(baits, deployed_names, per_access), number=runs
+    )
+    after = timeit.timeit(
+        lambda: deploy_like(baits, deployed_names, cached), number=runs
+    )
+    print(f"{BAITS_NO} baits, sort + compare against deployed versions")
+    print(f"per access: {before * 1e3 / runs:10.2f} ms")
+    print(f"cached:     {after * 1e3 / runs:10.2f} ms")
+    print(f"speedup:    {before / after:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,66 @@
 import click
-import pyfiglet as pf
-from data_baits.core.settings import settings, Environments
+import importlib
+from data_baits.core.settings import settings, Environments, YamlBackends
 from data_baits.logger import setup_logger
-from data_baits.generate import generate
-from data_baits.deploy import deploy
 
 
-@click.group()
+class LazyGroup(click.Group):
+    """A group importing the module of a subcommand only when it is run.
+
+    `lazy_subcommands` maps the name of a subcommand to a tuple of
+    ("module:attribute", short help), the latter is shown by --help.
+    """
+
+    def __init__(self, *args, lazy_subcommands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx):
+        return sorted(super().list_commands(ctx) + list(self.lazy_subcommands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands:
+            import_path, _ = self.lazy_subcommands[cmd_name]
+            module_name, attribute = import_path.split(":")
+            module = importlib.import_module(module_name)
+            return getattr(module, attribute)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        rows = [
+            (name, short_help)
+            for name, (_, short_help) in self.lazy_subcommands.items()
+        ]
+        rows += [
+            (name, command.get_short_help_str())
+            for name, command in self.commands.items()
+        ]
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(sorted(rows))
+
+
+@click.group(
+    cls=LazyGroup,
+    lazy_subcommands={
+        "generate": (
+            "data_baits.generate:generate",
+            "Generates baits based on the generate() method.",
+        ),
+        "deploy": (
+            "data_baits.deploy:deploy",
+            "Deploys (or rolls back) the baits of the sources or of a plan.",
+        ),
+        "plan": (
+            "data_baits.plan:plan",
+            "Plans a deployment offline, see deploy --plan.",
+        ),
+        "merge": (
+            "data_baits.merge:merge",
+            "Merges the outputs of generate run with --shard_count.",
+        ),
+    },
+)
 @click.option(
     "--verbosity",
     default="INFO",
@@ -19,18 +73,26 @@ from data_baits.deploy import deploy
     default=None,
     type=click.Choice(Environments),
 )
-def cli(verbosity, environment):
+@click.option(
+    "--yaml_backend",
+    help="YAML implementation used to read and write the manifests",
+    default=None,
+    type=click.Choice(YamlBackends),
+)
+def cli(verbosity, environment, yaml_backend):
     setup_logger(
         verbosity,
         settings.LOGGER_NAME,
     )
     if environment:
         settings.ENVIRONMENT = environment
+    if yaml_backend:
+        settings.YAML_BACKEND = yaml_backend
 
 
-cli.add_command(generate)
-cli.add_command(deploy)
 if __name__ == "__main__":
+    import pyfiglet as pf
+
     click.secho(
         pf.figlet_format("Data Baits"),
         fg="blue",
@@ -2,45 +2,103 @@ from typing import Any
 from pydantic import BaseModel
 from pydantic import (
     FilePath,
+    PrivateAttr,
     field_validator,
     ValidationError,
 )
-from typing import List
-from pydantic_yaml import to_yaml_str, parse_yaml_raw_as
+from typing import Iterable, Iterator, List, Optional, Type
+from data_baits.core.settings import ManifestFormats, settings
+from data_baits.core.serialization import dump_manifest, load_manifest
 from typing_extensions import Literal
 import os
 import re
 from packaging.version import Version
 import importlib
+from data_baits.sources import manifest_signature
+from data_baits.core.registry import ScopedRegistry
+import bisect
+import hmac
+import threading
+import contextvars
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+_object_getattr = object.__getattribute__
 
-class BaitRegistry:
-    _instance = None
 
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super(BaitRegistry, cls).__new__(
-                cls, *args, **kwargs
-            )
-            cls._instance._registry = {}
-        return cls._instance
-
-    def get(self, name: str, version: str = None) -> dict[str, "Bait"]:
-        latest_bait = None
-        for bait in self._registry.values():
-            if bait.name == name:
-                if not version:
-                    if not latest_bait:
-                        latest_bait = bait
-                    elif bait.version > latest_bait.version:
-                        latest_bait = bait
-                else:
-                    if bait.version == version:
-                        return bait
-        return latest_bait
+class BaitRegistry(ScopedRegistry):
+    def _setup(self) -> None:
+        self._registry = {}
+        # name -> [(Version, id), ...] kept sorted by version
+        self._index = {}
+        self._lock = threading.RLock()
+
+    def get(self, name: str, version: str = None) -> "Bait":
+        versions = self._index.get(name)
+        if not versions:
+            return None
+        if not version:
+            return self._registry[versions[-1][1]]
+        version = Version(str(version))
+        position = bisect.bisect_left(versions, (version,))
+        if position < len(versions) and versions[position][0] == version:
+            return self._registry[versions[position][1]]
+        return None
+
+    def get_range(
+        self,
+        name: str,
+        min_version: str = None,
+        max_version: str = None,
+    ) -> List["Bait"]:
+        """Returns baits with min_version <= version < max_version."""
+        versions = self._index.get(name, [])
+        start, end = 0, len(versions)
+        if min_version is not None:
+            start = bisect.bisect_left(versions, (Version(str(min_version)),))
+        if max_version is not None:
+            end = bisect.bisect_left(versions, (Version(str(max_version)),))
+        return [self._registry[bait_id] for _, bait_id in versions[start:end]]
+
+    def versions(self, name: str) -> List[Version]:
+        return [version for version, _ in self._index.get(name, [])]
+
+    def add(self, bait: "Bait") -> None:
+        with self._lock:
+            if bait.id() in self._registry:
+                raise ValueError(f"Bait with id '{bait.id()}' already exists.")
+            self.set(bait)
 
     def set(self, bait: "Bait") -> None:
-        self._registry[bait.id()] = bait
+        bait_id = bait.id()
+        with self._lock:
+            if bait_id in self._registry:
+                self._unindex(bait_id)
+            self._registry[bait_id] = bait
+            bait.__pydantic_private__["_registry"] = weakref.ref(self)
+            bisect.insort(
+                self._index.setdefault(bait.name, []),
+                (bait.version, bait_id),
+            )
+
+    def remove(self, bait_id: str) -> None:
+        with self._lock:
+            if bait_id in self._registry:
+                self._unindex(bait_id)
+                del self._registry[bait_id]
+
+    def _unindex(self, bait_id: str) -> None:
+        name = self._registry[bait_id].name
+        versions = self._index[name]
+        versions[:] = [entry for entry in versions if entry[1] != bait_id]
+        if not versions:
+            del self._index[name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._registry.clear()
+            self._index.clear()
 
     def all(self) -> dict[str, dict[str, "Bait"]]:
         return self._registry
@@ -50,6 +108,21 @@ class GenericBait(BaseModel):
     name: str
     type: Literal["GenericBait"] = "GenericBait"
     version: str = str(Version("0.1.0"))
+    # (raw version string, its parsed Version) so that it is parsed once
+    _version_key: Optional[tuple[str, Version]] = PrivateAttr(None)
+    # the registry the bait was added to, re-indexed when the id changes
+    _registry: Optional[weakref.ref] = PrivateAttr(None)
+
+    @property
+    def version_key(self) -> Version:
+        # bypasses __getattribute__ below as this is a hot path
+        raw = _object_getattr(self, "__dict__")["version"]
+        private = _object_getattr(self, "__pydantic_private__")
+        cached = private.get("_version_key")
+        if cached is None or cached[0] is not raw:
+            cached = (raw, Version(raw))
+            private["_version_key"] = cached
+        return cached[1]
 
     def id(self, use_version: bool = True) -> str:
         value = f"{self.type.lower()}-{self.name}"
@@ -58,25 +131,48 @@ class GenericBait(BaseModel):
         return value
 
     def __setattr__(self, name, value):
+        key = None
         if name == "version":
-            if not isinstance(value, Version):
-                if not isinstance(value, str):
-                    value = str(value)
-                value = Version(value)
-            value = str(value)
+            key = value
+            if not isinstance(key, Version):
+                key = Version(str(key))
+            value = str(key)
+        if name in ("name", "version"):
+            # keep the index of the registry owning the bait, not
+            # necessarily the current one, in sync with the new id
+            owner = self.__pydantic_private__.get("_registry")
+            registry = owner() if owner is not None else None
+            registered = (
+                registry is not None and registry.all().get(self.id()) is self
+            )
+            if registered:
+                registry.remove(self.id())
+            result = super().__setattr__(name, value)
+            if key is not None:
+                self.__pydantic_private__["_version_key"] = (value, key)
+            if registered:
+                registry.set(self)
+            return result
         return super().__setattr__(name, value)
 
+    def __getstate__(self) -> dict:
+        # the owning registry is not pickled, e.g. from the workers of
+        # load_many, the unpickled bait is added to the caller's registry
+        state = super().__getstate__()
+        state["__pydantic_private__"] = {
+            **state["__pydantic_private__"],
+            "_registry": None,
+        }
+        return state
+
     def __getattribute__(self, __name) -> Any:
-        value = super().__getattribute__(__name)
         if __name == "version":
-            value = Version(value)
-        return value
+            return _object_getattr(self, "version_key")
+        return _object_getattr(self, __name)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        if self.id() in BaitRegistry().all():
-            raise ValueError(f"Bait with id '{self.id()}' already exists.")
-        BaitRegistry().set(self)
+        BaitRegistry().add(self)
 
     @staticmethod
     def get(name: str) -> "Bait":
@@ -110,31 +206,72 @@ class PhysicalBait(GenericBait):
         raise NotImplementedError
 
     @staticmethod
-    def _yaml_to_bait_core(content: str) -> "Bait":
+    def bait_class(bait_type: str) -> Type["Bait"]:
+        if bait_type not in _BAIT_CLASSES:
+            requested_bait = getattr(
+                importlib.import_module("data_baits.baits"), bait_type, None
+            )
+            if not (
+                isinstance(requested_bait, type)
+                and issubclass(requested_bait, PhysicalBait)
+            ):
+                raise ValueError(f"Unknown bait type '{bait_type}'.")
+            _BAIT_CLASSES[bait_type] = requested_bait
+        return _BAIT_CLASSES[bait_type]
+
+    @classmethod
+    def _construct_signed(cls, data: dict) -> Optional["PhysicalBait"]:
+        """Constructs a bait from a manifest signed by generate.
+
+        The manifest was validated when generated, so only the fields
+        which the id and the version comparison depend on are checked.
+        Returns None if they are not strings, as the validators require,
+        so that the manifest is validated as any other.
+        """
+        destinations = data.get("destinations")
+        if not (
+            isinstance(data.get("name"), str)
+            and isinstance(data.get("version", ""), str)
+            and isinstance(destinations, list)
+            and destinations
+            and all(isinstance(env, str) for env in destinations)
+        ):
+            return None
+        data["name"] = cls.parse_k8_name(data["name"])
+        data["destinations"] = [cls.parse_k8_name(env) for env in destinations]
+        bait = cls.model_construct(**data)
+        # parses the version, so that an invalid one is not registered
+        bait.version_key
+        BaitRegistry().add(bait)
+        return bait
+
+    @staticmethod
+    def _yaml_to_bait_core(content: str, signature: str = None) -> "Bait":
+        data = load_manifest(content)
+        if not isinstance(data, dict):
+            raise ValueError("Bait manifest must be a mapping.")
+        bait_type = data.get("type", "Bait")
+        requested_bait = Bait.bait_class(bait_type)
+        key = settings.SOURCES_SIGNING_KEY
+        if (
+            signature
+            and key
+            and hmac.compare_digest(
+                signature, manifest_signature(content, key)
+            )
+        ):
+            bait = requested_bait._construct_signed(data)
+            if bait is not None:
+                return bait
+        if requested_bait is Bait:
+            return Bait.model_validate(data)
         try:
-            parsed = parse_yaml_raw_as(Bait, content)
+            return requested_bait.model_validate(data)
         except ValidationError as e:
-            if len(e.errors()) == 1:
-                error = e.errors()[0]
-                if not (
-                    error["type"] == "literal_error"
-                    and error["loc"] == ("type",)
-                ):
-                    raise e
-                this_type = error["input"]
-                requested_bait = getattr(
-                    importlib.import_module("data_baits.baits"), this_type
-                )
-                try:
-                    parsed = parse_yaml_raw_as(requested_bait, content)
-                except ValidationError:
-                    raise ValueError(
-                        f"Failed to parse bait with type "
-                        f"'{error['input']}'."
-                    )
-            else:
-                raise e
-        return parsed
+            raise ValueError(
+                f"Failed to parse bait with type '{bait_type}'. "
+                f"Details:\n{e}"
+            )
 
     @staticmethod
     def yaml_to_bait(file_path: FilePath) -> "Bait":
@@ -143,8 +280,77 @@ class PhysicalBait(GenericBait):
         return Bait._yaml_to_bait_core(content)
 
     @staticmethod
-    def yaml_str_to_bait(content: str) -> "Bait":
-        return Bait._yaml_to_bait_core(content)
+    def yaml_str_to_bait(content: str, signature: str = None) -> "Bait":
+        """Parses a manifest, validating it unless it is trusted.
+
+        A manifest is trusted if `signature` is its HMAC with the
+        configured SOURCES_SIGNING_KEY, in which case only its name,
+        destinations and version are validated.
+        """
+        return Bait._yaml_to_bait_core(content, signature=signature)
+
+    @staticmethod
+    def load_many(
+        sources: Iterable[str | tuple[str, str] | tuple[str, str, str]],
+        errors: Optional[dict[str, str]] = None,
+        max_workers: Optional[int] = None,
+        use_processes: bool = True,
+    ) -> Iterator["Bait"]:
+        """Parses many manifests in a pool, yielding them in order.
+
+        A source is either a path to a manifest file or a tuple of
+        (label, manifest content) with an optional signature, see
+        `yaml_str_to_bait`. Sources that fail to parse are
+        skipped and their error messages are stored in `errors`.
+        """
+        if errors is None:
+            errors = {}
+        max_workers = max_workers or os.cpu_count() or 1
+        if max_workers == 1:
+            for source in sources:
+                label, bait, error = _load_source(source)
+                if error:
+                    errors[label] = error
+                else:
+                    yield bait
+            return
+        if use_processes:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        # bound the number of parsed, but not yet consumed baits
+        pending = deque()
+        sources = iter(sources)
+        with executor:
+            while True:
+                while len(pending) < 2 * max_workers:
+                    source = next(sources, None)
+                    if source is None:
+                        break
+                    if use_processes:
+                        future = executor.submit(_load_source, source)
+                    else:
+                        # threads must register in the caller's registry
+                        future = executor.submit(
+                            contextvars.copy_context().run,
+                            _load_source,
+                            source,
+                        )
+                    pending.append(future)
+                if not pending:
+                    break
+                label, bait, error = pending.popleft().result()
+                if error:
+                    errors[label] = error
+                    continue
+                if use_processes:
+                    # baits were registered in the worker processes only
+                    try:
+                        BaitRegistry().add(bait)
+                    except ValueError as e:
+                        errors[label] = str(e)
+                        continue
+                yield bait
 
     @field_validator("name")
     def validate_k8_name(cls, v):
@@ -161,12 +367,37 @@ class PhysicalBait(GenericBait):
         if create_path:
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, "w") as f:
-            f.write(to_yaml_str(self))
+            f.write(self.dump_to_yaml_str())
 
     def dump_to_yaml_str(self) -> str:
-        return to_yaml_str(self)
+        return dump_manifest(self, ManifestFormats.yaml)
+
+    def dump_to_json_str(self) -> str:
+        return dump_manifest(self, ManifestFormats.json)
+
+    def dump_to_str(self, manifest_format: ManifestFormats = None) -> str:
+        """Dumps the manifest in the given or the configured format."""
+        return dump_manifest(self, manifest_format)
 
 
 # for backwards compatibility
 class Bait(PhysicalBait):
     type: Literal["Bait"] = "Bait"
+
+
+# bait type -> class, filled lazily by PhysicalBait.bait_class
+_BAIT_CLASSES: dict[str, Type[PhysicalBait]] = {"Bait": Bait}
+
+
+def _load_source(
+    source: str | tuple[str, str] | tuple[str, str, str],
+) -> tuple[str, Optional[Bait], Optional[str]]:
+    try:
+        if isinstance(source, str):
+            return source, Bait.yaml_to_bait(source), None
+        label, content, *signature = source
+        bait = Bait.yaml_str_to_bait(content, *signature)
+        return label, bait, None
+    except Exception as e:
+        label = source if isinstance(source, str) else source[0]
+        return label, None, f"{type(e).__name__}: {e}"
@@ -1,14 +1,16 @@
-from data_baits.baits.trap import Trap
-from data_baits.baits.pipeline import Pipeline
-from data_baits.baits.database import (
-    SQLiteDatabase,
-    MySQLInternalDatabase,
-    Database,
-)
-from data_baits.baits.data_model import (
-    DataModel,
-    DBRegistry,
-)
+import importlib
+
+# the baits are imported on first use, as some of them pull in
+# heavy dependencies (kfp, kubernetes, sqlmodel)
+_BAIT_MODULES = {
+    "Pipeline": "data_baits.baits.pipeline",
+    "Trap": "data_baits.baits.trap",
+    "Database": "data_baits.baits.database",
+    "MySQLInternalDatabase": "data_baits.baits.database",
+    "SQLiteDatabase": "data_baits.baits.database",
+    "DataModel": "data_baits.baits.data_model",
+    "DBRegistry": "data_baits.baits.data_model",
+}
 
 __all__ = [
     "Pipeline",
@@ -19,3 +21,17 @@ __all__ = [
     "DataModel",
     "DBRegistry",
 ]
+
+
+def __getattr__(name: str):
+    if name not in _BAIT_MODULES:
+        raise AttributeError(
+            f"module 'data_baits.baits' has no attribute '{name}'"
+        )
+    value = getattr(importlib.import_module(_BAIT_MODULES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
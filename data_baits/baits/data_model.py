@@ -1,4 +1,5 @@
 from data_baits.bait import LogicalBait
+from data_baits.core.registry import ScopedRegistry
 from typing_extensions import Literal
 from sqlmodel import (
     SQLModel,
@@ -8,21 +9,26 @@ from sqlmodel import (
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import registry
 from pydantic import model_validator, ConfigDict
-import inflect
 from typing import Type
 import re
 
 
-class DBRegistry:
-    _instance = None
+def _inflect_engine():
+    # inflect takes seconds to import, so it is loaded on first use
+    global _INFLECT_ENGINE
+    if _INFLECT_ENGINE is None:
+        import inflect
 
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super(DBRegistry, cls).__new__(
-                cls, *args, **kwargs
-            )
-            cls._instance._registry = {}
-        return cls._instance
+        _INFLECT_ENGINE = inflect.engine()
+    return _INFLECT_ENGINE
+
+
+_INFLECT_ENGINE = None
+
+
+class DBRegistry(ScopedRegistry):
+    def _setup(self) -> None:
+        self._registry = {}
 
     def _generate_registry(self, name: str) -> registry:
         class _registry(SQLModel, registry=registry()):
@@ -77,7 +83,7 @@ class DataModel(LogicalBait):
             value = re.sub(r"([A-Z]{2,})", r"_\1", self.name)
             value = re.sub(r"([a-z])([A-Z])", r"\1_\2", value)
             value = DataModel.parse_k8_name(value, hyphens=False)
-            value = inflect.engine().plural(value)
+            value = _inflect_engine().plural(value)
             self.table_name = value
         return self
 
@@ -5,6 +5,8 @@ from pydantic import model_validator
 from kubernetes import client
 from data_baits.core.settings import settings
 from data_baits.core.storage_class import StorageClass, StorageReclaimPolicy
+from data_baits.core.watches import wait_for, wait_for_deletion
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import json
 import time
@@ -36,6 +38,10 @@ class SQLiteDatabase(Database):
     def deploy(self) -> bool:
         return True
 
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the deployed database accepts connections."""
+        return True
+
     @staticmethod
     def rollback(*_, **__) -> bool:
         return True
@@ -278,11 +284,66 @@ class MySQLInternalDatabase(Database):
                     passed = False
         return passed
 
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the deployment is available and its pod is ready.
+
+        Both are followed with watches, for at most `timeout` seconds,
+        settings.READY_TIMEOUT by default.
+        """
+        if timeout is None:
+            timeout = settings.READY_TIMEOUT
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        deadline = time.monotonic() + timeout
+
+        def available(deployments) -> bool:
+            return any(
+                deployment.status
+                and (deployment.status.available_replicas or 0) > 0
+                for deployment in deployments
+            )
+
+        def ready(pods) -> bool:
+            return any(
+                pod.metadata.deletion_timestamp is None
+                and any(
+                    condition.type == "Ready" and condition.status == "True"
+                    for condition in (pod.status.conditions or [])
+                )
+                for pod in pods
+                if pod.status
+            )
+
+        logger.debug(f"-> Waiting for deployment {self.database_name()}...")
+        if not wait_for(
+            client.AppsV1Api().list_namespaced_deployment,
+            available,
+            timeout,
+            namespace=self.namespace,
+            field_selector=f"metadata.name={self.database_name()}",
+        ):
+            return False
+        logger.debug(f"-> Waiting for pod of {self.database_name()}...")
+        return wait_for(
+            client.CoreV1Api().list_namespaced_pod,
+            ready,
+            max(0.0, deadline - time.monotonic()),
+            namespace=self.namespace,
+            label_selector=f"app={self.database_name()}",
+        )
+
     @staticmethod
     def rollback(
         name: str,  # eq. of database_name()
         namespace: str,
+        timeout: Optional[float] = None,
     ) -> bool:
+        """Deletes the resources of the database, waiting for them to go.
+
+        Returns False if a resource is not deleted within `timeout`
+        seconds, settings.DELETE_TIMEOUT by default.
+        """
+        if timeout is None:
+            timeout = settings.DELETE_TIMEOUT
         logger = logging.getLogger(settings.LOGGER_NAME)
         v1 = client.CoreV1Api()
         v1_apps = client.AppsV1Api()
@@ -306,29 +367,63 @@ class MySQLInternalDatabase(Database):
                 passed = False
             else:
                 logger.debug("-> No autogenerated secrets found.")
-        for resource_name, callback in [
-            ("service", v1.delete_namespaced_service),
-            ("deployment", v1_apps.delete_namespaced_deployment),
+        resources = [
+            (
+                "service",
+                v1.delete_namespaced_service,
+                v1.list_namespaced_service,
+            ),
+            (
+                "deployment",
+                v1_apps.delete_namespaced_deployment,
+                v1_apps.list_namespaced_deployment,
+            ),
             (
                 "persistent_volume_claim",
                 v1.delete_namespaced_persistent_volume_claim,
+                v1.list_namespaced_persistent_volume_claim,
             ),
-            ("persistent_volume", v1.delete_persistent_volume),
-        ]:
+            (
+                "persistent_volume",
+                v1.delete_persistent_volume,
+                v1.list_persistent_volume,
+            ),
+        ]
+
+        def delete(resource_name, delete_callback, list_callback) -> bool:
+            kwargs = {}
+            if resource_name != "persistent_volume":
+                kwargs["namespace"] = namespace
             try:
                 logger.debug(f"-> Deleting {resource_name}...")
-                kwargs = {
-                    "name": name,
-                }
-                if resource_name != "persistent_volume":
-                    kwargs["namespace"] = namespace
-                callback(**kwargs)
-                # sleep just in case to propagate the changes
-                time.sleep(3)
+                delete_callback(
+                    name=name,
+                    # the deployment is deleted after its pods
+                    body=client.V1DeleteOptions(
+                        propagation_policy="Foreground"
+                    ),
+                    **kwargs,
+                )
             except client.exceptions.ApiException as e:
                 logger.error(
                     f"-> {resource_name} deletion failed! " f"Details:\n{e}"
                 )
                 if json.loads(e.body).get("reason", "") != "NotFound":
-                    passed = False
+                    return False
+            if not wait_for_deletion(list_callback, name, timeout, **kwargs):
+                logger.error(
+                    f"-> {resource_name} {name} was not deleted "
+                    f"within {timeout} s!"
+                )
+                return False
+            logger.debug(f"-> Deleted {resource_name}.")
+            return True
+
+        # the resources are deleted at the same time, the volume and its
+        # claim are only removed once they are no longer used
+        with ThreadPoolExecutor(max_workers=len(resources)) as executor:
+            results = list(
+                executor.map(lambda resource: delete(*resource), resources)
+            )
+        passed &= all(results)
         return passed
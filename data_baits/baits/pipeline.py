@@ -1,14 +1,31 @@
 from kfp.components.base_component import BaseComponent
-from typing import Dict, Any, Optional
-from kfp import compiler, client
+from typing import Dict, Any, Iterator, Optional, Tuple
+from contextlib import contextmanager
+from kfp import client, compiler
+from google.protobuf import json_format
 from pydantic import FilePath, PrivateAttr
 from data_baits.bait import Bait
 from typing_extensions import Literal
-import tempfile
-from ruamel.yaml import YAML
+from data_baits.core.serialization import dump_yaml, load_yaml
 from kfp_server_api.exceptions import ApiException
 import logging
+import tempfile
 from data_baits.core.settings import settings
+from data_baits.cache import CompileCache
+from data_baits.catalogue import PipelineCatalogue
+
+# kfp internals, which compile the pipelines without writing them to a file
+try:
+    from kfp.compiler import pipeline_spec_builder
+
+    try:
+        from kfp.dsl.types import type_utils
+    except ImportError:  # kfp < 2.1
+        from kfp.components.types import type_utils
+    pipeline_spec_builder.modify_pipeline_spec_with_override
+    type_utils.TypeCheckManager
+except (ImportError, AttributeError):  # moved, the public compiler is used
+    pipeline_spec_builder = type_utils = None
 
 
 class Pipeline(Bait):
@@ -18,6 +35,8 @@ class Pipeline(Bait):
     parameters: Optional[Dict[str, Any]] = None
     description: Optional[str] = None
     _kfp: Optional[BaseComponent] = PrivateAttr(None)
+    # (definition, its serialized package) uploaded by deploy()
+    _package: Optional[Tuple[dict, bytes]] = PrivateAttr(None)
 
     def __init__(self, *args, kfp_pipeline: BaseComponent = None, **kwargs):
         super().__init__(*args, **kwargs)
@@ -27,68 +46,142 @@ class Pipeline(Bait):
     def set_kfp_pipeline(self, kfp_pipeline: BaseComponent) -> None:
         self._kfp = kfp_pipeline
 
-    def compile(self) -> None:
+    def compile(self, cache: Optional[CompileCache] = None) -> None:
         if not self._kfp:
             raise AttributeError(
                 "You must set the pipeline before compiling the bait."
             )
-        with tempfile.NamedTemporaryFile(suffix=".yaml") as f:
-            compiler.Compiler().compile(
-                pipeline_func=self._kfp,
-                package_path=f.name,
-                pipeline_name=self.name,
-                type_check=self.type_check,
-                pipeline_parameters=self.parameters,
+        if not isinstance(self._kfp, BaseComponent):
+            raise ValueError(
+                "Unsupported pipeline type. Expected a component or a "
+                f"pipeline built with kfp decorators. Got: {type(self._kfp)}"
+            )
+        if cache and cache.load(self):
+            return
+        if pipeline_spec_builder is None:
+            with tempfile.NamedTemporaryFile(suffix=".yaml") as f:
+                compiler.Compiler().compile(
+                    pipeline_func=self._kfp,
+                    package_path=f.name,
+                    pipeline_name=self.name,
+                    type_check=self.type_check,
+                    pipeline_parameters=self.parameters,
+                )
+                f.seek(0)
+                definition = load_yaml(f.read().decode("utf-8"))
+        else:
+            definition = self._compile_in_memory()
+        self.__setattr__("definition", definition, override=True)
+        if cache:
+            cache.store(self)
+
+    def _compile_in_memory(self) -> dict:
+        # the same as compiler.Compiler().compile(), without the yaml file
+        with type_utils.TypeCheckManager(enable=self.type_check):
+            pipeline_spec = (
+                pipeline_spec_builder.modify_pipeline_spec_with_override(
+                    pipeline_spec=self._kfp.pipeline_spec,
+                    pipeline_name=self.name,
+                    pipeline_parameters=self.parameters,
+                )
+            )
+        if self._kfp.platform_spec.platforms:
+            raise ValueError(
+                "Platform-specific features are not supported in pipelines."
             )
-            f.seek(0)
-            self.__setattr__("definition", YAML().load(f), override=True)
+        return _sort_keys(json_format.MessageToDict(pipeline_spec))
 
     def __setattr__(self, name, value, override=False):
         if name == "definition" and not override:
             raise AttributeError("definition is read-only")
         return super().__setattr__(name, value)
 
-    def dump_to_yaml(
-        self, file_path: FilePath, create_path: bool = False
-    ) -> None:
+    def _check_compiled(self) -> None:
         if not self.definition:
             raise AttributeError(
                 "You must compile the bait before dumping it to yaml."
             )
+
+    def dump_to_yaml(
+        self, file_path: FilePath, create_path: bool = False
+    ) -> None:
+        self._check_compiled()
         return super().dump_to_yaml(file_path, create_path)
 
+    def dump_to_str(self, *args, **kwargs) -> str:
+        self._check_compiled()
+        return super().dump_to_str(*args, **kwargs)
+
     def deploy(
         self,
         client: client.Client,
         use_version=False,
+        catalogue: Optional[PipelineCatalogue] = None,
+        package_path: Optional[str] = None,
     ) -> bool:
+        """Uploads the pipeline, or its version with `use_version`.
+
+        The package is written to `package_path` by package_file(), or
+        to a temporary file, as the KFP client only uploads files.
+        """
         logger = logging.getLogger(settings.LOGGER_NAME)
-        with tempfile.NamedTemporaryFile(suffix=".yaml") as f:
-            yaml = YAML()
-            yaml.dump(self.definition, f)
-            f.seek(0)
-            try:
-                if not use_version:
-                    client.upload_pipeline(
-                        pipeline_package_path=f.name,
-                        pipeline_name=self.name,
-                        description=self.description,
-                    )
-                else:
-                    client.upload_pipeline_version(
-                        pipeline_package_path=f.name,
-                        pipeline_name=self.name,
-                        pipeline_version_name=str(self.version),
-                        description=self.description,
-                    )
-            except ApiException as e:
-                logger.error(
-                    f"Failed to deploy pipeline '{self.id()}' "
-                    f"with version '{self.version}'. Details:\n{e}"
+        if package_path is None:
+            with self.package_file() as package_path:
+                return self.deploy(
+                    client, use_version, catalogue, package_path
+                )
+        try:
+            if not use_version:
+                response = client.upload_pipeline(
+                    pipeline_package_path=package_path,
+                    pipeline_name=self.name,
+                    description=self.description,
+                )
+            else:
+                # the catalogue saves the lookup of the pipeline id
+                pipeline_id = (
+                    catalogue.pipeline_id(self.name) if catalogue else None
+                )
+                response = client.upload_pipeline_version(
+                    pipeline_package_path=package_path,
+                    pipeline_version_name=str(self.version),
+                    pipeline_id=pipeline_id,
+                    pipeline_name=None if pipeline_id else self.name,
+                    description=self.description,
                 )
-                return False
+        except ApiException as e:
+            logger.error(
+                f"Failed to deploy pipeline '{self.id()}' "
+                f"with version '{self.version}'. Details:\n{e}"
+            )
+            return False
+        logger.debug(f"-> Uploaded pipeline '{response.pipeline_id}'.")
+        if catalogue and use_version:
+            catalogue.add_version(
+                self.name, str(self.version), response.pipeline_version_id
+            )
+        elif catalogue:
+            catalogue.add_pipeline(self.name, response.pipeline_id)
         return True
 
+    @contextmanager
+    def package_file(self) -> Iterator[str]:
+        """Writes the package to a temporary file, e.g. for many uploads."""
+        with tempfile.NamedTemporaryFile(suffix=".yaml") as f:
+            f.write(self.package())
+            f.flush()
+            yield f.name
+
+    def package(self) -> bytes:
+        """Returns the definition serialized for the upload, once."""
+        self._check_compiled()
+        if self._package is None or self._package[0] is not self.definition:
+            self._package = (
+                self.definition,
+                dump_yaml(self.definition, sort_keys=False).encode("utf-8"),
+            )
+        return self._package[1]
+
     @staticmethod
     def rollback(
         pipeline_id: str,  # it's the pipeline id via client!
@@ -112,3 +205,11 @@ class Pipeline(Bait):
             )
             return False
         return True
+
+
+def _sort_keys(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _sort_keys(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [_sort_keys(item) for item in value]
+    return value
@@ -0,0 +1,314 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from importlib import metadata
+import ast
+import hashlib
+import json
+import logging
+import os
+from data_baits import __version__
+from data_baits.bait import Bait
+from data_baits.core.settings import settings
+
+
+def _kfp_version() -> Optional[str]:
+    try:
+        return metadata.version("kfp")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _resolve_module(module: str, roots: Iterable[str]) -> List[str]:
+    """Returns the local files executed when importing the module."""
+    parts = module.split(".")
+    for root in roots:
+        files = []
+        base = root
+        for position, part in enumerate(parts):
+            base = os.path.join(base, part)
+            is_last = position == len(parts) - 1
+            if os.path.isfile(os.path.join(base, "__init__.py")):
+                files.append(os.path.join(base, "__init__.py"))
+            elif is_last and os.path.isfile(f"{base}.py"):
+                files.append(f"{base}.py")
+            elif not os.path.isdir(base):
+                break
+        else:
+            if files:
+                return files
+    return []
+
+
+def _imported_modules(file: str) -> Iterable[Tuple[str, List[str]]]:
+    """Yields (module, search roots) for every import of a python file."""
+    with open(file, "rb") as f:
+        tree = ast.parse(f.read(), filename=file)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name, None
+        elif isinstance(node, ast.ImportFrom):
+            roots = None
+            if node.level:
+                root = os.path.dirname(file)
+                for _ in range(node.level - 1):
+                    root = os.path.dirname(root)
+                roots = [root]
+            module = node.module or ""
+            # the imported names may be modules themselves
+            for alias in node.names:
+                yield ".".join(filter(None, [module, alias.name])), roots
+            if module:
+                yield module, roots
+
+
+def local_dependencies(file: str, roots: List[str]) -> Set[str]:
+    """Returns the file and the local files it imports, transitively.
+
+    Modules that cannot be found in the roots (or next to the importing
+    file) are considered external and are not followed.
+    """
+    dependencies = set()
+    to_visit = [os.path.abspath(file)]
+    while to_visit:
+        current = to_visit.pop()
+        if current in dependencies:
+            continue
+        dependencies.add(current)
+        try:
+            imports = list(_imported_modules(current))
+        except (OSError, SyntaxError, ValueError):
+            continue
+        for module, module_roots in imports:
+            search = module_roots or [os.path.dirname(current), *roots]
+            for dependency in _resolve_module(module, search):
+                to_visit.append(os.path.abspath(dependency))
+    return dependencies
+
+
+class GeneratorCache:
+    """On-disk cache of the baits emitted by the generator files.
+
+    An entry is keyed by a hash of the generator file, the local files it
+    imports (transitively), the kfp and data-baits versions, the
+    environment and the destinations, and holds the emitted manifests.
+    The data files, environment variables and settings read by the
+    generators are not a part of the key, so it is only used with
+    `generate --cache`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        destinations: List[str],
+        roots: List[str],
+        compile: bool = True,
+    ):
+        self.path = path
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.hits = 0
+        self.misses = 0
+        # file -> (key, {bait id -> bait or its recorded manifest})
+        self._pending: Dict[
+            str, Tuple[str, Optional[Dict[str, Union[Bait, str]]]]
+        ] = {}
+        # bait id -> file, for the baits not recorded yet
+        self._files: Dict[str, str] = {}
+        self._context = json.dumps(
+            [
+                __version__,
+                _kfp_version(),
+                settings.ENVIRONMENT,
+                sorted(destinations),
+                compile,
+            ]
+        )
+        os.makedirs(self.path, exist_ok=True)
+
+    def _entry_path(self, file: str) -> str:
+        name = hashlib.sha1(os.path.abspath(file).encode("utf-8"))
+        return os.path.join(self.path, f"{name.hexdigest()}.json")
+
+    def key(self, file: str) -> str:
+        digest = hashlib.sha256(self._context.encode("utf-8"))
+        for dependency in sorted(local_dependencies(file, self.roots)):
+            digest.update(dependency.encode("utf-8"))
+            with open(dependency, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
+
+    def get(self, file: str) -> Tuple[str, bool, Optional[List[str]]]:
+        """Returns (key, hit, manifests), manifests is None if no generator."""
+        key = self.key(file)
+        try:
+            with open(self._entry_path(file), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = {}
+        if entry.get("key") == key:
+            self.hits += 1
+            return key, True, entry["manifests"]
+        self.misses += 1
+        return key, False, None
+
+    def add(self, file: str, key: str, baits: Optional[List[Bait]]) -> None:
+        """Marks the baits of a file to be stored by record() or save()."""
+        if baits is not None:
+            baits = {bait.id(): bait for bait in baits}
+            for bait_id in baits:
+                self._files[bait_id] = file
+        self._pending[file] = (key, baits)
+
+    def record(self, bait: Bait) -> None:
+        """Stores the (compiled) bait, so that it can be released.
+
+        The entry of its file is written once all its baits are recorded.
+        """
+        file = self._files.pop(bait.id(), None)
+        if file not in self._pending:
+            return
+        key, baits = self._pending[file]
+        baits[bait.id()] = bait.dump_to_json_str()
+        if all(isinstance(manifest, str) for manifest in baits.values()):
+            self._write(file)
+
+    def forget(self, bait: Bait) -> None:
+        """Drops the entry of the file of a bait, e.g. failing to compile."""
+        file = self._files.pop(bait.id(), None)
+        if file in self._pending:
+            for bait_id in self._pending.pop(file)[1]:
+                self._files.pop(bait_id, None)
+
+    def _write(self, file: str) -> None:
+        key, baits = self._pending.pop(file)
+        manifests = None
+        if baits is not None:
+            manifests = [
+                (
+                    manifest
+                    if isinstance(manifest, str)
+                    else manifest.dump_to_json_str()
+                )
+                for manifest in baits.values()
+            ]
+        entry_path = self._entry_path(file)
+        with open(f"{entry_path}.tmp", "w") as f:
+            json.dump({"key": key, "manifests": manifests}, f)
+        os.replace(f"{entry_path}.tmp", entry_path)
+
+    def save(self) -> None:
+        """Stores the added baits, which must be compiled by now."""
+        for file in list(self._pending):
+            self._write(file)
+        self._files.clear()
+
+    def report(self) -> None:
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        total = self.hits + self.misses
+        if total:
+            logger.info(
+                f"Generator cache: {self.hits} hit(s), {self.misses} "
+                f"miss(es), {self.hits / total:.0%} hit rate."
+            )
+
+
+class CompileCache:
+    """Content-addressed on-disk cache of compiled pipeline definitions.
+
+    An entry is keyed by a fingerprint of the kfp pipeline spec (which
+    embeds the sources of its components), the name, the parameters,
+    type checking and the kfp version, so the directory can be shared
+    between machines, e.g. in CI. The least recently used entries are
+    evicted by evict() once the entries take more than `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def fingerprint(self, pipeline) -> Optional[str]:
+        """Returns the fingerprint or None if the pipeline has no spec."""
+        try:
+            specs = [pipeline._kfp.pipeline_spec]
+        except AttributeError:
+            return None
+        platform_spec = getattr(pipeline._kfp, "platform_spec", None)
+        if platform_spec is not None:
+            specs.append(platform_spec)
+        digest = hashlib.sha256(
+            json.dumps(
+                [
+                    _kfp_version(),
+                    pipeline.name,
+                    pipeline.type_check,
+                    pipeline.parameters,
+                ],
+                sort_keys=True,
+                default=str,
+            ).encode("utf-8")
+        )
+        for spec in specs:
+            digest.update(spec.SerializeToString(deterministic=True))
+        return digest.hexdigest()
+
+    def _entry_path(self, fingerprint: str) -> str:
+        return os.path.join(self.path, f"{fingerprint}.json")
+
+    def load(self, pipeline) -> bool:
+        """Sets the cached definition of the pipeline, if there is one."""
+        fingerprint = self.fingerprint(pipeline)
+        if fingerprint is None:
+            return False
+        entry_path = self._entry_path(fingerprint)
+        try:
+            with open(entry_path, "r") as f:
+                definition = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return False
+        try:
+            # the modification time orders the entries for eviction
+            os.utime(entry_path)
+        except OSError:
+            pass
+        self.hits += 1
+        pipeline.__setattr__("definition", definition, override=True)
+        return True
+
+    def store(self, pipeline) -> None:
+        fingerprint = self.fingerprint(pipeline)
+        if fingerprint is None or not pipeline.definition:
+            return
+        entry_path = self._entry_path(fingerprint)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(pipeline.definition, f)
+        os.replace(tmp_path, entry_path)
+
+    def evict(self) -> None:
+        """Removes the least recently used entries above max_bytes."""
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+            total -= size
+
+    def report(self) -> None:
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        total = self.hits + self.misses
+        if total:
+            logger.info(
+                f"Compile cache: {self.hits} hit(s), {self.misses} "
+                f"miss(es), {self.hits / total:.0%} hit rate."
+            )
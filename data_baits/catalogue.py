@@ -0,0 +1,122 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+import threading
+from data_baits.core.settings import settings
+
+
+def _pages(list_page: Callable[..., Any], attribute: str) -> Iterator[Any]:
+    """Yields the items of every page of a KFP list call."""
+    page_token = ""
+    while True:
+        response = list_page(page_token=page_token)
+        yield from getattr(response, attribute, None) or []
+        page_token = getattr(response, "next_page_token", None)
+        if not page_token:
+            return
+
+
+class PipelineCatalogue:
+    """Index of the pipelines deployed to KFP and of their versions.
+
+    The pipelines are listed, page after page, on the first lookup and
+    the versions of a pipeline on the first lookup of its versions. The
+    indexes are then kept up to date by the deploy and rollback calls
+    registering their changes, so that every pipeline is listed at most
+    once per run. It is safe to use from many threads.
+    """
+
+    def __init__(self, client: Any, page_size: int = None):
+        self.client = client
+        self.page_size = page_size or settings.LIST_PIPELINES_LIMIT
+        self._lock = threading.RLock()
+        # name -> [pipeline id, ...]
+        self._pipelines: Optional[Dict[str, List[str]]] = None
+        # pipeline id -> [(version name, version id), ...]
+        self._versions: Dict[str, List[Tuple[str, str]]] = {}
+
+    def _index(self) -> Dict[str, List[str]]:
+        with self._lock:
+            if self._pipelines is None:
+                logger = logging.getLogger(settings.LOGGER_NAME)
+                logger.debug("-> Listing the deployed pipelines...")
+                pipelines = {}
+                for pipeline in _pages(
+                    lambda page_token: self.client.list_pipelines(
+                        page_token=page_token, page_size=self.page_size
+                    ),
+                    "pipelines",
+                ):
+                    pipelines.setdefault(pipeline.display_name, []).append(
+                        pipeline.pipeline_id
+                    )
+                self._pipelines = pipelines
+            return self._pipelines
+
+    def pipeline_ids(self, name: str) -> List[str]:
+        return list(self._index().get(name, []))
+
+    def pipeline_id(self, name: str) -> Optional[str]:
+        """Returns the id of the pipeline or None if it is not deployed."""
+        pipeline_ids = self.pipeline_ids(name)
+        if len(pipeline_ids) > 1:
+            raise ValueError(
+                f"There are more than one pipeline with name '{name}'."
+            )
+        return pipeline_ids[0] if pipeline_ids else None
+
+    def versions(self, name: str) -> List[Tuple[str, str]]:
+        """Returns (version name, version id) of the versions of a pipeline.
+
+        The versions are in the order listed by KFP.
+        """
+        pipeline_id = self.pipeline_id(name)
+        if pipeline_id is None:
+            return []
+        with self._lock:
+            if pipeline_id not in self._versions:
+                self._versions[pipeline_id] = [
+                    (version.display_name, version.pipeline_version_id)
+                    for version in _pages(
+                        lambda page_token: self.client.list_pipeline_versions(
+                            pipeline_id=pipeline_id,
+                            page_token=page_token,
+                            page_size=self.page_size,
+                        ),
+                        "pipeline_versions",
+                    )
+                ]
+            return list(self._versions[pipeline_id])
+
+    def version_ids(self, name: str, version: str) -> List[str]:
+        return [
+            version_id
+            for version_name, version_id in self.versions(name)
+            if version_name == version
+        ]
+
+    def add_pipeline(self, name: str, pipeline_id: str) -> None:
+        with self._lock:
+            self._index().setdefault(name, []).append(pipeline_id)
+            # the upload of a pipeline creates its first version
+            self._versions.pop(pipeline_id, None)
+
+    def add_version(self, name: str, version: str, version_id: str) -> None:
+        with self._lock:
+            pipeline_id = self.pipeline_id(name)
+            if pipeline_id in self._versions:
+                self._versions[pipeline_id].append((version, version_id))
+
+    def remove_pipeline(self, name: str) -> None:
+        with self._lock:
+            for pipeline_id in self._index().pop(name, []):
+                self._versions.pop(pipeline_id, None)
+
+    def remove_version(self, name: str, version_id: str) -> None:
+        with self._lock:
+            pipeline_id = self.pipeline_id(name)
+            if pipeline_id in self._versions:
+                self._versions[pipeline_id] = [
+                    version
+                    for version in self._versions[pipeline_id]
+                    if version[1] != version_id
+                ]
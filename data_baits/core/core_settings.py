@@ -10,6 +10,22 @@ class Environments(str, Enum):
     test = "testing"
 
 
+class YamlBackends(str, Enum):
+    ruamel = "ruamel"
+    libyaml = "libyaml"
+
+
+class ManifestFormats(str, Enum):
+    yaml = "yaml"
+    json = "json"
+
+
+class SourcesCompressions(str, Enum):
+    none = "none"
+    gzip = "gzip"
+    zstd = "zstd"
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_prefix="DATA_BAITS_",
@@ -26,3 +42,23 @@ class Settings(BaseSettings):
     LOGGER_NAME: str = "DB"
     DEFAULT_STORAGE_CLASS: str = "microk8s-hostpath"
     LIST_PIPELINES_LIMIT: int = 1000
+    YAML_BACKEND: YamlBackends = YamlBackends.ruamel.value
+    MANIFEST_FORMAT: ManifestFormats = ManifestFormats.yaml.value
+    GENERATE_CACHE_DIR: str = ".data-baits-cache"
+    COMPILE_CACHE_DIR: str = ".data-baits-cache/compile"
+    COMPILE_CACHE_MAX_BYTES: int = 256 * 1024**2
+    SOURCES_COMPRESSION: SourcesCompressions = SourcesCompressions.gzip.value
+    # stays below the 1 MiB limit of a secret, leaving room for metadata
+    SOURCES_SECRET_MAX_BYTES: int = 900 * 1024
+    # signs the generated sources, so that deploy --trusted can skip their
+    # validation, nothing is trusted without it. The sniffer jobs read it
+    # from the `key` of the data-baits-signing-key secret.
+    SOURCES_SIGNING_KEY: str = ""
+    # seconds after which a finished sniffer job is deleted, so that
+    # applying its unchanged manifest again runs it again
+    SNIFFER_JOB_TTL: int = 3600
+    REGISTRY_SHARD_MAX_BYTES: int = 900 * 1024
+    # seconds to wait for the deletion of a resource by a rollback
+    DELETE_TIMEOUT: float = 120.0
+    # seconds to wait for a deployed database to be ready with --wait_ready
+    READY_TIMEOUT: float = 300.0
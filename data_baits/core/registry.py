@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+import threading
+
+
+class ScopedRegistry:
+    """Base of the registries, which can be scoped or swapped.
+
+    Calling the class returns the registry activated by the innermost
+    `scope()` of the current context or the process wide registry
+    otherwise, so that existing callers keep working unchanged.
+    """
+
+    _instance = None
+    _current: ContextVar = None
+    _instance_lock = threading.Lock()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._instance = None
+        cls._current = ContextVar(f"{cls.__name__}.current", default=None)
+
+    def __new__(cls, *args, **kwargs):
+        current = cls._current.get()
+        if current is not None:
+            return current
+        if not cls._instance:
+            with cls._instance_lock:
+                if not cls._instance:
+                    cls._instance = cls.create()
+        return cls._instance
+
+    def _setup(self) -> None:
+        raise NotImplementedError
+
+    @classmethod
+    def create(cls) -> "ScopedRegistry":
+        """Creates a new, empty registry that is not active anywhere."""
+        registry = super().__new__(cls)
+        registry._setup()
+        return registry
+
+    @classmethod
+    @contextmanager
+    def scope(
+        cls, registry: Optional["ScopedRegistry"] = None
+    ) -> Iterator["ScopedRegistry"]:
+        """Activates a (new by default) registry in the current context."""
+        if registry is None:
+            registry = cls.create()
+        token = cls._current.set(registry)
+        try:
+            yield registry
+        finally:
+            cls._current.reset(token)
+
+    @classmethod
+    def swap(cls, registry: "ScopedRegistry") -> "ScopedRegistry":
+        """Replaces the process wide registry, returning the previous one.
+
+        Once the previous registry is no longer referenced, it is garbage
+        collected together with everything it registered.
+        """
+        with cls._instance_lock:
+            previous, cls._instance = cls._instance, registry
+        return previous
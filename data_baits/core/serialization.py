@@ -0,0 +1,72 @@
+from typing import Any
+from io import StringIO
+import json
+import yaml
+from pydantic import BaseModel
+from ruamel.yaml import YAML
+from data_baits.core.settings import settings, YamlBackends, ManifestFormats
+
+try:
+    from yaml import CSafeDumper as _LibYamlDumper
+    from yaml import CSafeLoader as _LibYamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeDumper as _LibYamlDumper
+    from yaml import SafeLoader as _LibYamlLoader
+
+
+def _backend(backend: YamlBackends | None) -> YamlBackends:
+    return YamlBackends(backend or settings.YAML_BACKEND)
+
+
+def load_yaml(content: str, backend: YamlBackends = None) -> Any:
+    if _backend(backend) == YamlBackends.libyaml:
+        return yaml.load(content, Loader=_LibYamlLoader)
+    return YAML(typ="safe", pure=True).load(content)
+
+
+def dump_yaml(
+    data: Any,
+    backend: YamlBackends = None,
+    sort_keys: bool = True,
+) -> str:
+    if _backend(backend) == YamlBackends.libyaml:
+        return yaml.dump(
+            data,
+            Dumper=_LibYamlDumper,
+            sort_keys=sort_keys,
+            default_flow_style=False,
+            allow_unicode=True,
+        )
+    # the round-trip dumper keeps the insertion order of the keys
+    writer = YAML(typ="safe", pure=True) if sort_keys else YAML()
+    writer.default_flow_style = False
+    stream = StringIO()
+    writer.dump(data, stream)
+    return stream.getvalue()
+
+
+def load_manifest(content: str, backend: YamlBackends = None) -> Any:
+    """Loads a YAML or a JSON manifest, the format is detected."""
+    if content.lstrip()[:1] == "{":
+        return json.loads(content)
+    return load_yaml(content, backend)
+
+
+def dump_manifest(
+    model: BaseModel,
+    manifest_format: ManifestFormats = None,
+    backend: YamlBackends = None,
+) -> str:
+    manifest_format = ManifestFormats(
+        manifest_format or settings.MANIFEST_FORMAT
+    )
+    if manifest_format == ManifestFormats.json:
+        return model.model_dump_json(indent=2)
+    return dump_yaml(json.loads(model.model_dump_json()), backend)
+
+
+def manifest_extension(manifest_format: ManifestFormats = None) -> str:
+    manifest_format = ManifestFormats(
+        manifest_format or settings.MANIFEST_FORMAT
+    )
+    return f".{manifest_format.value}"
@@ -1,4 +1,13 @@
-from data_baits.core.core_settings import Settings, Environments
+from data_baits.core.core_settings import (
+    Settings,
+    Environments,
+    YamlBackends,
+    ManifestFormats,
+    SourcesCompressions,
+)
 
 settings = Settings()
 Environments = Environments  # for backwards compatibility
+YamlBackends = YamlBackends
+ManifestFormats = ManifestFormats
+SourcesCompressions = SourcesCompressions
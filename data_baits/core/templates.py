@@ -55,6 +55,21 @@ SNIFFER_JOB_BASE = {
                             "deploy",
                             "--in_cluster",
                             "--from_secret",
+                            "--trusted",
+                        ],
+                        "env": [
+                            {
+                                # the key signing the sources, without it
+                                # all of them are validated
+                                "name": "DATA_BAITS_SOURCES_SIGNING_KEY",
+                                "valueFrom": {
+                                    "secretKeyRef": {
+                                        "name": "data-baits-signing-key",
+                                        "key": "key",
+                                        "optional": True,
+                                    },
+                                },
+                            },
                         ],
                     },
                 ],
@@ -0,0 +1,68 @@
+from typing import Any, Callable, List
+import math
+import time
+from kubernetes import client, watch
+
+HTTP_STATUS_GONE = 410
+
+
+def wait_for(
+    list_call: Callable[..., Any],
+    condition: Callable[[List[Any]], bool],
+    timeout: float,
+    **kwargs,
+) -> bool:
+    """Waits until the condition holds for the objects of a list call.
+
+    The objects are listed once and then followed with a watch from the
+    listed resourceVersion, the condition is checked on every event.
+    Returns False if it does not hold within `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        listed = list_call(**kwargs)
+        objects = {item.metadata.name: item for item in listed.items}
+        if condition(list(objects.values())):
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        stream = watch.Watch()
+        try:
+            for event in stream.stream(
+                list_call,
+                resource_version=listed.metadata.resource_version,
+                timeout_seconds=max(1, math.ceil(remaining)),
+                **kwargs,
+            ):
+                item = event["object"]
+                if event["type"] == "DELETED":
+                    objects.pop(item.metadata.name, None)
+                else:
+                    objects[item.metadata.name] = item
+                if condition(list(objects.values())):
+                    return True
+                if time.monotonic() >= deadline:
+                    return False
+        except client.exceptions.ApiException as e:
+            # the listed resourceVersion is too old to watch from
+            if e.status != HTTP_STATUS_GONE:
+                raise
+        finally:
+            stream.stop()
+
+
+def wait_for_deletion(
+    list_call: Callable[..., Any],
+    name: str,
+    timeout: float,
+    **kwargs,
+) -> bool:
+    """Waits until the object with the name is deleted, see wait_for."""
+    return wait_for(
+        list_call,
+        lambda items: not items,
+        timeout,
+        field_selector=f"metadata.name={name}",
+        **kwargs,
+    )
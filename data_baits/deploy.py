@@ -1,6 +1,8 @@
-from datetime import datetime
+from typing import List
+import json
 import kfp
 import logging
+import time
 import click
 from kubernetes import (
     client,
@@ -12,19 +14,47 @@ from data_baits.baits import (
     Pipeline,
     Database,
 )
-from packaging.version import Version
 from data_baits.session import get_istio_auth_session
-import base64
 from data_baits.core.settings import settings
+from data_baits.sources import decode_secrets
+from data_baits.plan import check_plan, select_baits
+from data_baits.executor import run_stages
+from data_baits.catalogue import PipelineCatalogue
+from data_baits.sniffer_registry import SnifferRegistry
 
 
-CONFIG_MAP_BODY = {
-    "apiVersion": "v1",
-    "data": {},
-    "kind": "ConfigMap",
-    "metadata": {"name": "sniffer-registry"},
-    "type": "Opaque",
-}
+def _current_source_secrets(
+    secrets: List[client.V1Secret],
+) -> List[List[client.V1Secret]]:
+    """Groups the sources secrets (shards) by environment.
+
+    Shards left over from previous sources, i.e. with a different hash
+    than the first shard, which is always rewritten, are skipped.
+    """
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    groups = {}
+    for secret in secrets:
+        labels = secret.metadata.labels or {}
+        groups.setdefault(labels.get("data-baits-source"), []).append(
+            (labels, secret)
+        )
+    current = []
+    for env, env_secrets in groups.items():
+        current_hash = None
+        for labels, _ in env_secrets:
+            if labels.get("data-baits-shard", "0") == "0":
+                current_hash = labels.get("data-baits-sources-hash")
+        kept = []
+        for labels, secret in env_secrets:
+            if labels.get("data-baits-sources-hash") != current_hash:
+                logger.warning(
+                    "-> Skipping stale sources secret "
+                    f"'{secret.metadata.name}' of '{env}'."
+                )
+                continue
+            kept.append(secret)
+        current.append(kept)
+    return current
 
 
 def connect_to_pipeline_api(in_cluster, username, password, endpoint):
@@ -90,11 +120,29 @@ def deactivate_prompts(ctx, _, value):
     default=False,
     is_flag=True,
 )
+@click.option(
+    "--trusted",
+    help=(
+        "Only validate the ids and versions of the sources signed by "
+        "generate with the same DATA_BAITS_SOURCES_SIGNING_KEY."
+    ),
+    default=False,
+    is_flag=True,
+)
 @click.option(
     "--path",
     help="Path where the bait manifests are.",
     type=click.Path(exists=True),
 )
+@click.option(
+    "--plan",
+    "plan_file",
+    help=(
+        "Deploy (or roll back) the baits of a plan made by the plan "
+        "command instead of the sources."
+    ),
+    type=click.Path(exists=True, dir_okay=False),
+)
 @click.option(
     "--in_cluster",
     help="whether to run in cluster",
@@ -106,6 +154,38 @@ def deactivate_prompts(ctx, _, value):
     help="rollbacks selected baits",
     is_flag=True,
 )
+@click.option(
+    "--workers",
+    help=(
+        "Number of processes parsing the bait manifests, the manifests are "
+        "parsed in this process by default. Only worth it for many sources."
+    ),
+    type=int,
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--concurrency",
+    help=(
+        "Number of baits deployed (or rolled back) at the same time, the "
+        "versions of the same bait are always deployed one after another."
+    ),
+    type=int,
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--wait_ready",
+    help="Wait for the deployed databases to be ready.",
+    is_flag=True,
+)
+@click.option(
+    "--ready_timeout",
+    help="Seconds to wait for a database to be ready with --wait_ready.",
+    type=float,
+    default=settings.READY_TIMEOUT,
+    show_default=True,
+)
 @click.option(
     "--username",
     help="Username to access the kfp client",
@@ -126,17 +206,29 @@ def deactivate_prompts(ctx, _, value):
     hide_input=True,
 )
 def deploy(
-    from_secret, path, in_cluster, rollback, username, password, endpoint
+    from_secret,
+    trusted,
+    path,
+    plan_file,
+    in_cluster,
+    rollback,
+    workers,
+    concurrency,
+    wait_ready,
+    ready_timeout,
+    username,
+    password,
+    endpoint,
 ):
+    """Deploys (or rolls back) the baits of the sources or of a plan."""
     logger = logging.getLogger(settings.LOGGER_NAME)
     errors_no = 0
-    if not from_secret and not path:
+    if not from_secret and not path and not plan_file:
         raise ValueError(
-            "You must provide either --path or --from-secret argument!"
+            "You must provide either --path, --from-secret "
+            "or --plan argument!"
         )
     logger.info("Starting the deployment of data baits...")
-    deployment_time: datetime = None
-    registry: client.V1ConfigMap = None
     # connect to the cluster
     logger.debug("-> Connecting to the cluster...")
     if in_cluster:
@@ -149,153 +241,133 @@ def deploy(
     kfp_client = connect_to_pipeline_api(
         in_cluster, username, password, endpoint
     )
+    # the pipelines are listed once, when first needed
+    catalogue = PipelineCatalogue(kfp_client)
 
-    logger.debug("-> Checking if the registry is already created...")
-    try:
-        logger.debug("-> Trying to get the registry...")
-        registry = v1.read_namespaced_config_map(
-            name="sniffer-registry",
-            namespace="data-baits",
-        )
-        logger.debug("-> Registry found!")
-        deployment_time = registry.data["first_deployment"]
-    except client.exceptions.ApiException:
-        logger.debug("-> Registry secret not found!")
-        logger.debug("-> Creating the registry secret...")
-        deployment_time = datetime.utcnow()
-        body = CONFIG_MAP_BODY.copy()
-        body["data"]["first_deployment"] = deployment_time
-        registry = v1.create_namespaced_config_map(
-            namespace="data-baits",
-            body=body,
-        )
-    logger.info(f"-> Last sniffer deployment time: {deployment_time}")
-    logger.debug("-> Getting the list of all deployed baits...")
-    deployed_baits = registry.data
-    deployed_names = {}
-    for bait_name_version, bait_deployed_time in deployed_baits.items():
-        if bait_name_version == "first_deployment":
-            continue
-        name, version = bait_name_version.split("_")
-        deployed_names[name] = Version(version)
-        logger.debug(
-            f"-> '{name}' version '{version}' was "
-            f"deployed at {bait_deployed_time}."
-        )
-    if not deployed_baits:
+    logger.debug("-> Reading the registry...")
+    registry = SnifferRegistry(v1).load()
+    logger.info(
+        f"-> Last sniffer deployment time: {registry.first_deployment}"
+    )
+    deployed_names = registry.deployed()
+    for name, version in deployed_names.items():
+        logger.debug(f"-> '{name}' version '{version}' is deployed.")
+    if not deployed_names:
         logger.debug("-> No deployed baits so far!")
 
-    baits = []
-    if from_secret:
+    if plan_file:
+        logger.info(f"-> Using the plan '{plan_file}'...")
+        with open(plan_file) as f:
+            deployment_plan = json.load(f)
+        check_plan(deployment_plan, deployed_names)
+        rollback = deployment_plan["rollback"]
+        sources = (
+            (entry["source"], entry["manifest"])
+            for entry in deployment_plan["baits"]
+        )
+    elif from_secret:
+        if trusted and not settings.SOURCES_SIGNING_KEY:
+            logger.warning(
+                "-> No sources signing key set, validating all sources..."
+            )
         secrets = v1.list_secret_for_all_namespaces(
             label_selector="data-baits-source"
         )
-        for secret in secrets.items:
-            for encoded_bait in secret.data.values():
-                bait = base64.b64decode(encoded_bait.encode("utf-8")).decode(
-                    "utf-8"
-                )
-                bait = Bait.yaml_str_to_bait(bait)
-                baits.append(bait)
+        sources = (
+            (label, manifest, signature if trusted else None)
+            for env_secrets in _current_source_secrets(secrets.items)
+            for label, manifest, _, signature in decode_secrets(
+                (secret.metadata.name, secret.data) for secret in env_secrets
+            )
+        )
     else:
-        manifest_files = [
+        sources = (
             os.path.join(root, file)
             for root, _, files in os.walk(path)
             for file in files
-            if file.endswith(".yaml") or file.endswith(".yml")
-        ]
-        for file in manifest_files:
-            with open(file, "r") as f:
-                baits.append(Bait.yaml_to_bait(f.name))
+            if file.endswith((".yaml", ".yml", ".json"))
+        )
+    load_errors = {}
+    baits = list(
+        Bait.load_many(sources, errors=load_errors, max_workers=workers)
+    )
+    for source, error in load_errors.items():
+        logger.error(f"Failed to load bait from '{source}'. Details:\n{error}")
+    errors_no += len(load_errors)
 
     if rollback:
-        baits = sorted(baits, key=lambda b: b.version)
-        for bait in baits:
+        baits = select_baits(
+            (
+                (bait.id(use_version=False), bait.version, bait)
+                for bait in baits
+            ),
+            deployed_names,
+            rollback=True,
+        )
+
+        def rollback_bait(bait: Bait) -> bool:
             name = bait.id(use_version=False)
-            if name in deployed_names:
-                if bait.version == deployed_names[name]:
-                    passed = True
-                    logger.info(
-                        f"-> Rolling back bait '{name}' "
-                        f"to version '{bait.version}'..."
+            passed = True
+            logger.info(
+                f"-> Rolling back bait '{name}' "
+                f"to version '{bait.version}'..."
+            )
+            if isinstance(bait, Pipeline):
+                pipeline_ids = catalogue.pipeline_ids(bait.name)
+                if len(pipeline_ids) > 1:
+                    logger.error(
+                        f"There are more than one pipeline with name "
+                        f"'{name}'. This should not happen."
+                    )
+                    return False
+                if len(pipeline_ids) == 0:
+                    logger.error(
+                        f"There are no pipelines with name "
+                        f"'{name}'. This should not happen."
+                    )
+                    return False
+                versions = catalogue.versions(bait.name)
+                exact_versions = catalogue.version_ids(
+                    bait.name, str(bait.version)
+                )
+                if len(exact_versions) == 1:
+                    passed &= Pipeline.rollback(
+                        exact_versions[0],
+                        kfp_client,
+                        use_version=True,
                     )
-                    if isinstance(bait, Pipeline):
-                        available_pipelines = kfp_client.list_pipelines(
-                            # this will hopefully suffice for now
-                            page_size=settings.LIST_PIPELINES_LIMIT,
-                        ).pipelines
-                        available_pipelines = [
-                            p
-                            for p in available_pipelines
-                            if p.name == bait.name
-                        ]
-                        if len(available_pipelines) > 1:
-                            logger.error(
-                                f"There are more than one pipeline with name "
-                                f"'{name}'. This should not happen."
-                            )
-                            passed = False
-                            continue
-                        if len(available_pipelines) == 0:
-                            logger.error(
-                                f"There are no pipelines with name "
-                                f"'{name}'. This should not happen."
-                            )
-                            passed = False
-                            continue
-                        versioned_pipelines = (
-                            kfp_client.list_pipeline_versions(
-                                pipeline_id=available_pipelines[0].id,
-                                page_size=settings.LIST_PIPELINES_LIMIT,
-                            ).versions
-                        )
-                        exact_pipelines = [
-                            p
-                            for p in versioned_pipelines
-                            if p.name == str(bait.version)
-                        ]
-                        if len(exact_pipelines) == 1:
-                            passed &= Pipeline.rollback(
-                                exact_pipelines[0].id,
-                                kfp_client,
-                                use_version=True,
-                            )
-                        if (
-                            len(versioned_pipelines) == 2
-                            and versioned_pipelines[0].name == bait.name
-                        ):
-                            passed &= Pipeline.rollback(
-                                versioned_pipelines[0].id,
-                                kfp_client,
-                                use_version=False,
-                            )
-                    elif issubclass(type(bait), Database):
-                        passed &= type(bait).rollback(
-                            bait.database_name(),
-                            namespace=bait.namespace,
-                        )
-                    errors_no += not passed
                     if passed:
-                        deployed_baits.pop(
-                            f"{bait.id(use_version=False)}_{bait.version}"
-                        )
-            else:
-                logger.info(
-                    f"-> Bait '{name}' with version "
-                    f"'{bait.version}' was never deployed, skipping..."
+                        catalogue.remove_version(bait.name, exact_versions[0])
+                # only the version created with the pipeline is left
+                if len(versions) == 2 and versions[0][0] == bait.name:
+                    passed &= Pipeline.rollback(
+                        pipeline_ids[0],
+                        kfp_client,
+                        use_version=False,
+                    )
+                    if passed:
+                        catalogue.remove_pipeline(bait.name)
+            elif issubclass(type(bait), Database):
+                passed &= type(bait).rollback(
+                    bait.database_name(),
+                    namespace=bait.namespace,
                 )
-        logger.info("-> Updating the registry...")
-        print(deployed_baits)
-        v1.delete_namespaced_config_map(
-            name="sniffer-registry",
-            namespace="data-baits",
-        )
-        body = CONFIG_MAP_BODY.copy()
-        body["data"] = deployed_baits
-        v1.create_namespaced_config_map(
-            namespace="data-baits",
-            body=body,
+            return passed
+
+        # pipelines are removed before the databases they may use
+        results = run_stages(
+            [
+                [bait for bait in baits if isinstance(bait, Pipeline)],
+                [bait for bait in baits if not isinstance(bait, Pipeline)],
+            ],
+            rollback_bait,
+            concurrency,
         )
+        for result in results:
+            errors_no += not result.passed
+            if result.passed:
+                bait = result.bait
+                registry.remove(bait.id(use_version=False), bait.version)
         if errors_no > 0:
             logger.error(
                 "Deployment finished with error(s). "
@@ -304,28 +376,11 @@ def deploy(
         logger.info("Done!")
         return
     logger.debug("-> Checking if there are new baits to deploy...")
-    new_baits = []
-    # sort baits by version to make sure that the oldest are deployed first
-    baits = sorted(baits, key=lambda b: b.version)
-    for bait in baits:
-        name = bait.id(use_version=False)
-        if name not in deployed_names:
-            logger.debug(
-                f"--> Found a new bait: '{name}'"
-                f" with version '{bait.version}'."
-            )
-            new_baits.append(bait)
-        elif bait.version > deployed_names[name]:
-            logger.debug(
-                f"--> Found a newer version of bait: '{name}': "
-                f"{bait.version} > {deployed_names[name]}."
-            )
-            new_baits.append(bait)
-        else:
-            logger.debug(
-                f"--> Bait '{name}' with version "
-                f"'{bait.version}' was previously deployed."
-            )
+    # sorted by version to make sure that the oldest are deployed first
+    new_baits = select_baits(
+        ((bait.id(use_version=False), bait.version, bait) for bait in baits),
+        deployed_names,
+    )
     if new_baits:
         logger.info("-> Found new baits to deploy!")
         # pipelines must be deployed first
@@ -342,51 +397,75 @@ def deploy(
                     "but its deployment is not supported yet."
                 )
 
-        available_pipelines = kfp_client.list_pipelines(
-            # this will hopefully suffice for now
-            page_size=settings.LIST_PIPELINES_LIMIT,
-        )
-        if len(available_pipelines.pipelines) > settings.LIST_PIPELINES_LIMIT:
-            raise ValueError(
-                f"There are more than {settings.LIST_PIPELINES_LIMIT} "
-                "pipelines in the cluster, which must be increased."
-            )
-        available_pipelines_names = [
-            p.name for p in available_pipelines.pipelines
-        ]
-        for pipeline in new_pipelines:
+        # bait id -> seconds from the deployment to the readiness
+        ready_latencies = {}
+
+        def deploy_bait(bait: Bait) -> bool:
+            if isinstance(bait, Pipeline):
+                logger.info(
+                    f"-> Deploying new pipeline '{bait.id()}'"
+                    f" with version '{bait.version}'..."
+                )
+                passed = True
+                # the versions of a pipeline are deployed one by one, both
+                # uploads of a new pipeline share the written package
+                with bait.package_file() as package_path:
+                    if catalogue.pipeline_id(bait.name) is None:
+                        passed = bait.deploy(
+                            kfp_client,
+                            use_version=False,
+                            catalogue=catalogue,
+                            package_path=package_path,
+                        )
+                    if passed:
+                        passed = bait.deploy(
+                            kfp_client,
+                            use_version=True,
+                            catalogue=catalogue,
+                            package_path=package_path,
+                        )
+                return passed
             logger.info(
-                f"-> Deploying new pipeline '{pipeline.id()}'"
-                f" with version '{pipeline.version}'..."
+                f"-> Deploying new database '{bait.id()}'"
+                f" with version '{bait.version}'..."
             )
-            passed = True
-            if pipeline.name not in available_pipelines_names:
-                passed = pipeline.deploy(kfp_client, use_version=False)
-                available_pipelines_names.append(pipeline.name)
-            if passed:
-                passed = pipeline.deploy(kfp_client, use_version=True)
-            errors_no += not passed
-            if passed:
-                deployed_baits[
-                    f"{pipeline.id(use_version=False)}_{pipeline.version}"
-                ] = datetime.utcnow()
-        for database in new_databases:
-            logger.info(
-                f"-> Deploying new database '{database.id()}'"
-                f" with version '{database.version}'..."
+            deploy_started = time.perf_counter()
+            passed = bait.deploy()
+            if passed and wait_ready:
+                if not bait.wait_ready(ready_timeout):
+                    logger.error(
+                        f"-> Database '{bait.id()}' is not ready "
+                        f"after {ready_timeout} s!"
+                    )
+                    return False
+                ready_latencies[bait.id()] = (
+                    time.perf_counter() - deploy_started
+                )
+            return passed
+
+        started = time.perf_counter()
+        results = run_stages(
+            [new_pipelines, new_databases], deploy_bait, concurrency
+        )
+        for result in results:
+            logger.debug(
+                f"--> '{result.bait.id()}' "
+                f"{'deployed' if result.passed else 'failed'} "
+                f"in {result.seconds:.2f} s."
             )
-            passed = database.deploy()
-            errors_no += not passed
-            if passed:
-                deployed_baits[
-                    f"{database.id(use_version=False)}_{database.version}"
-                ] = datetime.utcnow()
-        logger.info("-> Updating the registry...")
-        v1.patch_namespaced_config_map(
-            name="sniffer-registry",
-            namespace="data-baits",
-            body={"data": deployed_baits},
+            errors_no += not result.passed
+            if result.passed:
+                registry.add(
+                    result.bait.id(use_version=False), result.bait.version
+                )
+        passed_no = sum(result.passed for result in results)
+        logger.info(
+            f"-> Deployed {passed_no} bait(s), "
+            f"{len(results) - passed_no} failed, "
+            f"in {time.perf_counter() - started:.2f} s."
         )
+        for bait_id, latency in ready_latencies.items():
+            logger.info(f"--> Database '{bait_id}' ready in {latency:.2f} s.")
     else:
         logger.info("-> No new baits to deploy!")
     if errors_no > 0:
@@ -0,0 +1,74 @@
+from typing import Callable, Iterable, List, NamedTuple, Optional
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from data_baits.bait import Bait
+from data_baits.core.settings import settings
+
+
+class BaitResult(NamedTuple):
+    bait: Bait
+    passed: bool
+    seconds: float
+    error: Optional[str] = None
+
+
+def bait_chains(baits: Iterable[Bait]) -> List[List[Bait]]:
+    """Groups the versions of the same bait, keeping the order of the baits."""
+    chains = {}
+    for bait in baits:
+        chains.setdefault(bait.id(use_version=False), []).append(bait)
+    return list(chains.values())
+
+
+def _run_chain(
+    chain: List[Bait], action: Callable[[Bait], bool]
+) -> List[BaitResult]:
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    results = []
+    for bait in chain:
+        started = time.perf_counter()
+        error = None
+        try:
+            passed = bool(action(bait))
+        except Exception as e:
+            passed = False
+            error = f"{type(e).__name__}: {e}"
+            logger.error(f"Failed to process bait '{bait.id()}': {error}")
+        results.append(
+            BaitResult(bait, passed, time.perf_counter() - started, error)
+        )
+    return results
+
+
+def run_stages(
+    stages: Iterable[Iterable[Bait]],
+    action: Callable[[Bait], bool],
+    concurrency: int = 1,
+) -> List[BaitResult]:
+    """Runs the action on the baits in at most `concurrency` threads.
+
+    A stage starts when the previous one has finished, e.g. pipelines
+    before databases. Within a stage, the versions of the same bait are
+    processed one after another in the given order, while different
+    baits are processed concurrently. The results follow the order of
+    the stages and of the baits.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for stage in stages:
+            stage = list(stage)
+            # the actions see the caller's registry
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run, _run_chain, chain, action
+                )
+                for chain in bait_chains(stage)
+            ]
+            stage_results = {}
+            for future in futures:
+                for result in future.result():
+                    stage_results[id(result.bait)] = result
+            results += [stage_results[id(bait)] for bait in stage]
+    return results
@@ -1,111 +1,417 @@
 import os
-from ruamel.yaml import YAML
 import logging
-from typing import List, Dict
+from typing import (
+    List,
+    Dict,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 from data_baits.baits import Pipeline
-from collections import defaultdict
+from collections import deque
 import importlib.util
+import hashlib
+import copy
+import re
+import shutil
+import tempfile
+import multiprocessing
+from multiprocessing.connection import Connection, wait
+import time
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 import click
-from data_baits.core.settings import settings
+from data_baits.core.settings import settings, ManifestFormats
 from data_baits.core.templates import (
     SNIFFER_JOB_BASE,
     SOURCES_SECRET_BASE,
     NAMESPACE_BASE,
     KUSTOMIZATION_BASE,
 )
-from data_baits.bait import Bait
+from data_baits.bait import Bait, BaitRegistry
 from pydantic import ValidationError
-import base64
-import string
-import random
+from data_baits.sources import (
+    encode_source,
+    manifest_checksum,
+    shard_sources,
+)
+from data_baits.cache import CompileCache, GeneratorCache
+from data_baits.core.serialization import dump_yaml, manifest_extension
 
-EnvBaits = Dict[str, List[Bait]]
+# pipelines compiled by the forked workers of compile_stream
+_COMPILE_QUEUE: List[Pipeline] = []
 
 
-def compile_baits(env_baits: EnvBaits) -> None:
-    logger = logging.getLogger(settings.LOGGER_NAME)
-    logger.info("Compiling baits...")
-    for baits in env_baits.values():
-        for bait in baits:
-            if isinstance(bait, Pipeline):
-                if bait.definition:
-                    logger.debug(
-                        f"-> Pipeline '{bait.name}' "
-                        "already compiled. Skipping..."
-                    )
-                else:
-                    logger.debug(f"-> Compiling bait '{bait.name}'...")
-                    bait.compile()
-    logger.info("Done.")
+def _compile_in_worker(index: int) -> Tuple[int, dict]:
+    pipeline = _COMPILE_QUEUE[index]
+    pipeline.compile()
+    return index, pipeline.definition
 
 
-def find_baits(
-    paths: List[str],
-    destinations: List[str],
-) -> EnvBaits:
+def _compile_pipelines(
+    pipelines: List[Pipeline],
+    jobs: int,
+    cache: Optional[CompileCache] = None,
+) -> Iterator[Tuple[Pipeline, Optional[str]]]:
+    """Compiles the pipelines, yielding (pipeline, error) as they finish."""
+    global _COMPILE_QUEUE
+    if jobs <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for pipeline in pipelines:
+            try:
+                pipeline.compile(cache=cache)
+                yield pipeline, None
+            except Exception as e:
+                yield pipeline, f"{type(e).__name__}: {e}"
+        return
+    if cache:
+        # look up the cache in the parent, only misses go to the workers
+        misses = []
+        for pipeline in pipelines:
+            if cache.load(pipeline):
+                yield pipeline, None
+            else:
+                misses.append(pipeline)
+        pipelines = misses
+    # the workers are forked, so that they inherit the kfp pipelines,
+    # which are usually defined in modules that cannot be imported again
+    _COMPILE_QUEUE = pipelines
+    try:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context("fork"),
+        ) as executor:
+            futures = {
+                executor.submit(_compile_in_worker, index): pipeline
+                for index, pipeline in enumerate(pipelines)
+            }
+            for future in as_completed(futures):
+                pipeline = futures[future]
+                try:
+                    _, definition = future.result()
+                except Exception as e:
+                    yield pipeline, f"{type(e).__name__}: {e}"
+                    continue
+                pipeline.__setattr__("definition", definition, override=True)
+                if cache:
+                    cache.store(pipeline)
+                yield pipeline, None
+    finally:
+        _COMPILE_QUEUE = []
+
+
+def compile_stream(
+    baits: Iterable[Tuple[Bait, List[str]]],
+    jobs: int = 1,
+    cache: Optional[CompileCache] = None,
+) -> Iterator[Tuple[Bait, List[str], Optional[str]]]:
+    """Compiles the pipelines of streamed (bait, destinations).
+
+    Yields (bait, destinations, error). With `jobs`, the pipelines are
+    compiled in batches, so that only a few of them wait in memory.
+    """
     logger = logging.getLogger(settings.LOGGER_NAME)
+    batch_size = 1 if jobs <= 1 else 4 * jobs
+    batch = {}
+
+    def flush() -> Iterator[Tuple[Bait, List[str], Optional[str]]]:
+        pipelines = [pipeline for pipeline, _ in batch.values()]
+        for pipeline, error in _compile_pipelines(pipelines, jobs, cache):
+            yield pipeline, batch[pipeline.id()][1], error
+        batch.clear()
+
+    for bait, envs in baits:
+        if not isinstance(bait, Pipeline) or bait.definition:
+            yield bait, envs, None
+            continue
+        logger.debug(f"-> Compiling bait '{bait.name}'...")
+        batch[bait.id()] = (bait, envs)
+        if len(batch) >= batch_size:
+            yield from flush()
+    if batch:
+        yield from flush()
 
+
+def find_generator_files(paths: List[str], verbose: bool = True) -> List[str]:
+    """Returns the python files in the paths, which may have generate()."""
+    logger = logging.getLogger(settings.LOGGER_NAME)
     all_files = []
     for path in paths:
-        logger.info(f"Scanning for generator files in '{path}'...")
+        if verbose:
+            logger.info(f"Scanning for generator files in '{path}'...")
         all_files += [
             os.path.join(root, file)
             for root, _, files in os.walk(path)
             for file in files
             if file.endswith(".py") and file != "__init__.py"
         ]
-    generator_files = []
-    baits = defaultdict(list)
-    name_registry = []
-    for file in all_files:
-        spec = importlib.util.spec_from_file_location("module.name", file)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        if hasattr(module, "generate"):
-            logger.debug(f"-> Found a generator file '{file}'.")
-            local_baits = []
-            try:
-                local_baits = module.generate()
-            except ValidationError as e:
-                logger.error(
-                    f"Failed to generate baits/traps from '{file}'. "
-                    f"Details:\n{e}"
-                )
-            err_msg = "generate() must return a list of Baits."
-            if not isinstance(local_baits, list):
-                raise ValueError(err_msg)
+    return all_files
+
+
+def in_shard(file: str, shard_index: int, shard_count: int) -> bool:
+    """Assigns a generator file to one of `shard_count` shards.
+
+    The assignment only depends on the path relative to the working
+    directory, so it is the same on every machine running a shard.
+    """
+    if shard_count <= 1:
+        return True
+    relative_path = os.path.relpath(file).replace(os.sep, "/")
+    digest = hashlib.sha1(relative_path.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count == shard_index
+
+
+def execute_generator(file: str) -> Optional[List[Bait]]:
+    """Returns the baits generated by a file or None if it has no generate().
+
+    Every file is loaded as a separate module, so that files with the same
+    global names do not overwrite each other.
+    """
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    path_hash = hashlib.sha1(os.path.abspath(file).encode("utf-8"))
+    module_name = f"data_baits_generator_{path_hash.hexdigest()[:16]}"
+    spec = importlib.util.spec_from_file_location(module_name, file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, "generate"):
+        return None
+    logger.debug(f"-> Found a generator file '{file}'.")
+    local_baits = []
+    try:
+        local_baits = module.generate()
+    except ValidationError as e:
+        logger.error(
+            f"Failed to generate baits/traps from '{file}'. Details:\n{e}"
+        )
+    err_msg = "generate() must return a list of Baits."
+    if not isinstance(local_baits, list):
+        raise ValueError(err_msg)
+    for bait in local_baits:
+        if not isinstance(bait, Bait):
+            raise ValueError(err_msg)
+    return local_baits
+
+
+def _generator_worker(
+    file: str,
+    destinations: List[str],
+    compile: bool,
+    connection: Connection,
+) -> None:
+    """Runs a generator file in a worker process, see _run_in_workers."""
+    try:
+        manifests = None
+        local_baits = execute_generator(file)
+        if local_baits is not None:
+            manifests = []
             for bait in local_baits:
-                if not isinstance(bait, Bait):
-                    raise ValueError(err_msg)
-                valid_envs = [
-                    env for env in bait.destinations if env in destinations
-                ]
-                if not valid_envs:
-                    logger.warning(
-                        f"--> Skipping {bait.type} with id: '{bait.id()}' "
-                        "because it is not valid for any of the "
-                        f"destinations: {destinations}"
-                    )
+                if not set(bait.destinations) & set(destinations):
                     continue
-                logger.debug(
-                    f"--> Found {bait.type} with id: '{bait.id()}' "
-                    f"for destinations: {valid_envs}"
+                if compile and isinstance(bait, Pipeline):
+                    if not bait.definition:
+                        bait.compile()
+                manifests.append(bait.dump_to_json_str())
+        connection.send((manifests, None))
+    except Exception as e:
+        connection.send((None, f"{type(e).__name__}: {e}"))
+    finally:
+        connection.close()
+
+
+def _run_in_workers(
+    files: List[str],
+    destinations: List[str],
+    compile: bool,
+    workers: int,
+    timeout: Optional[float] = None,
+) -> Iterator[Tuple[str, Optional[List[str]], Optional[str]]]:
+    """Runs generator files in parallel subprocesses.
+
+    Yields (file, manifests, error) as the files finish, where manifests
+    is None for files without the generate() method. A file running for
+    longer than `timeout` seconds is killed and reported as an error.
+    """
+    context = multiprocessing.get_context()
+    pending = deque(files)
+    running = {}
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                file = pending.popleft()
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(
+                    target=_generator_worker,
+                    args=(file, destinations, compile, sender),
                 )
-                if bait.id() in name_registry:
-                    raise ValueError(
-                        f"Found duplicate id '{bait.name}' in '{file}'."
+                process.start()
+                sender.close()
+                running[receiver] = (process, file, time.monotonic())
+            wait_for = None
+            if timeout:
+                first_deadline = min(
+                    started + timeout for _, _, started in running.values()
+                )
+                wait_for = max(0, first_deadline - time.monotonic())
+            for receiver in wait(list(running), timeout=wait_for):
+                process, file, _ = running.pop(receiver)
+                try:
+                    manifests, error = receiver.recv()
+                except EOFError:
+                    process.join()
+                    manifests, error = None, (
+                        f"Worker exited with code {process.exitcode}."
                     )
-                name_registry.append(bait.name)
-                for env in valid_envs:
-                    baits[env].append(bait)
-            generator_files.append(file)
-        else:
-            logger.warning(
-                f"-> File '{file}' is not a generator file."
-                "It must implement a generate() function."
-                "Skipping..."
+                receiver.close()
+                process.join()
+                yield file, manifests, error
+            if timeout:
+                now = time.monotonic()
+                for receiver, (process, file, started) in list(
+                    running.items()
+                ):
+                    if now - started >= timeout:
+                        del running[receiver]
+                        process.terminate()
+                        process.join()
+                        receiver.close()
+                        yield file, None, f"Timed out after {timeout} s."
+    finally:
+        for process, _, _ in running.values():
+            process.terminate()
+            process.join()
+
+
+def iter_baits(
+    paths: List[str],
+    destinations: List[str],
+    workers: int = 0,
+    timeout: Optional[float] = None,
+    compile: bool = False,
+    cache: Optional[GeneratorCache] = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> Iterator[Tuple[Bait, List[str]]]:
+    """Yields (bait, its destinations) generated by the files in the paths.
+
+    By default the files are executed one by one in this process. With
+    `workers`, they run in that many subprocesses, each killed after
+    `timeout` seconds, and their pipelines are compiled there if
+    `compile` is set. Files with a valid entry in the `cache` are not
+    executed at all, the others are added to it. The baits are yielded
+    as soon as their file is run and only the files of the given shard
+    are run, see in_shard.
+    """
+    logger = logging.getLogger(settings.LOGGER_NAME)
+
+    all_files = [
+        file
+        for file in find_generator_files(paths)
+        if in_shard(file, shard_index, shard_count)
+    ]
+    if shard_count > 1:
+        logger.info(
+            f"Running {len(all_files)} file(s) of the shard "
+            f"{shard_index + 1}/{shard_count}."
+        )
+    generator_files = []
+    failed_files = []
+    bait_files = {}
+
+    def skip(file: str) -> None:
+        logger.warning(
+            f"-> File '{file}' is not a generator file."
+            "It must implement a generate() function."
+            "Skipping..."
+        )
+
+    def collect(
+        file: str, local_baits: List[Bait]
+    ) -> List[Tuple[Bait, List[str]]]:
+        collected = []
+        for bait in local_baits:
+            valid_envs = [
+                env for env in bait.destinations if env in destinations
+            ]
+            if not valid_envs:
+                logger.warning(
+                    f"--> Skipping {bait.type} with id: '{bait.id()}' "
+                    "because it is not valid for any of the "
+                    f"destinations: {destinations}"
+                )
+                continue
+            logger.debug(
+                f"--> Found {bait.type} with id: '{bait.id()}' "
+                f"for destinations: {valid_envs}"
             )
-    other_files = [file for file in all_files if file not in generator_files]
+            if bait.id() in bait_files:
+                raise ValueError(
+                    f"Found duplicate id '{bait.id()}' in '{file}' "
+                    f"and '{bait_files[bait.id()]}'."
+                )
+            bait_files[bait.id()] = file
+            collected.append((bait, valid_envs))
+        generator_files.append(file)
+        return collected
+
+    def load_manifests(manifests: List[str]) -> List[Bait]:
+        return [Bait.yaml_str_to_bait(manifest) for manifest in manifests]
+
+    files_to_run = all_files
+    keys = {}
+    if cache:
+        files_to_run = []
+        for file in all_files:
+            keys[file], hit, manifests = cache.get(file)
+            if not hit:
+                files_to_run.append(file)
+            elif manifests is None:
+                skip(file)
+            else:
+                logger.debug(f"-> Using cached baits of '{file}'.")
+                yield from collect(file, load_manifests(manifests))
+
+    def done(
+        file: str, local_baits: Optional[List[Bait]]
+    ) -> List[Tuple[Bait, List[str]]]:
+        if local_baits is None:
+            skip(file)
+            if cache:
+                cache.add(file, keys[file], None)
+            return []
+        collected = collect(file, local_baits)
+        if cache:
+            cache.add(file, keys[file], [bait for bait, _ in collected])
+        return collected
+
+    if workers:
+        logger.info(f"Running generator files in {workers} workers...")
+        for file, manifests, error in _run_in_workers(
+            files_to_run, destinations, compile, workers, timeout
+        ):
+            if error:
+                logger.error(
+                    f"Failed to generate baits/traps from '{file}'. "
+                    f"Details:\n{error}"
+                )
+                failed_files.append(file)
+            elif manifests is None:
+                done(file, None)
+            else:
+                logger.debug(f"-> Found a generator file '{file}'.")
+                yield from done(file, load_manifests(manifests))
+    else:
+        for file in files_to_run:
+            yield from done(file, execute_generator(file))
+    other_files = [
+        file
+        for file in all_files
+        if file not in generator_files and file not in failed_files
+    ]
     generator_files_no = len(generator_files)
     logger.debug(f"Processed ({generator_files_no}/{len(all_files)}) files.")
     other_files_no = len(other_files)
@@ -113,90 +419,428 @@ def find_baits(
         logger.warning(f"Found {other_files_no} without the generate method!")
         for file in other_files:
             logger.warning(f"-> '{file}'")
+    if failed_files:
+        raise ValueError(
+            f"Failed to run {len(failed_files)} generator file(s)."
+        )
     logger.info("Done.")
-    return baits
 
 
-def dump_bait_manifests(
-    env_baits: EnvBaits,
-    path: str,
-) -> None:
+def _is_unchanged(file_path: str, data: bytes) -> bool:
+    """Returns True if the file already has this content."""
+    try:
+        if os.path.getsize(file_path) == len(data):
+            with open(file_path, "rb") as f:
+                current = hashlib.sha256(f.read()).digest()
+            return current == hashlib.sha256(data).digest()
+    except OSError:
+        pass
+    return False
+
+
+def _write_if_changed(
+    file_path: str, content: str, staged_path: Optional[str] = None
+) -> bool:
+    """Writes the file unless it already has this content.
+
+    With `staged_path`, the content is written there instead, to be moved
+    to `file_path` later.
+    """
+    data = content.encode("utf-8")
+    if _is_unchanged(file_path, data):
+        return False
+    with open(staged_path or file_path, "wb") as f:
+        f.write(data)
+    return True
+
+
+class _EnvOutput(NamedTuple):
+    """What is written for an environment once all its baits are."""
+
+    path: str
+    # bait manifest name -> (checksum, its sources secret entries)
+    sources: Dict[str, Tuple[str, Dict[str, str]]]
+    # bait manifest name -> namespace of the bait
+    bait_namespaces: Dict[str, str]
+    namespaces: Set[str]
+
+
+def _write_env_resources(
+    env: str, output: _EnvOutput, staging_path: str
+) -> Tuple[int, int, List[str]]:
+    """Stages the sources secrets, the sniffer job, the namespaces and the
+    kustomization of an environment in the staging path.
+
+    Returns (written, skipped, names of the files to remove).
+    """
     logger = logging.getLogger(settings.LOGGER_NAME)
-    for env, baits in env_baits.items():
-        sources = {}
-        env_path = os.path.join(path, env)
-        if not os.path.exists(env_path):
-            logger.debug(f"Creating directory '{env_path}'...")
-            os.makedirs(env_path)
-        logger.info(f"Dumping bait manifests to '{env_path}'...")
-        with open(os.path.join(env_path, "sniffer_job.yaml"), "w") as f:
-            logger.debug(f"-> Writing a job manifest to '{f.name}'...")
-            sniffer_job = SNIFFER_JOB_BASE.copy()
-            letters = string.ascii_lowercase
-            uq_suffix = "".join(random.choice(letters) for i in range(4))
-            sniffer_job["metadata"]["name"] = f"sniffer-{env}-{uq_suffix}"
-            sniffer_job["metadata"][
-                "generateName"
-            ] = f"sniffer-{env}-{uq_suffix}-"
-            YAML().dump(sniffer_job, f)
-        secret = SOURCES_SECRET_BASE.copy()
-        secret["metadata"]["name"] = f"data-baits-source-{env}"
-        secret["metadata"]["labels"]["data-baits-source"] = env
-        secret["metadata"]["labels"]["redeployable-1-name"] = sniffer_job[
-            "metadata"
-        ]["name"]
-        for bait in baits:
-            bait_manifest_name = f"{bait.id()}.yaml"
-            destination = os.path.join(
-                env_path,
-                bait_manifest_name,
-            )
-            logger.debug(
-                f"-> Dumping bait '{bait.id()}' to '{destination}'..."
-            )
-            bait.dump_to_yaml(
-                destination,
-                create_path=True,
+    written = skipped = 0
+
+    def write(file_name: str, content: str) -> None:
+        nonlocal written, skipped
+        file_path = os.path.join(output.path, file_name)
+        staged_path = os.path.join(staging_path, file_name)
+        if _write_if_changed(file_path, content, staged_path):
+            logger.debug(f"-> Written '{file_path}'.")
+            written += 1
+        else:
+            logger.debug(f"-> Skipped unchanged '{file_path}'.")
+            skipped += 1
+
+    # the name of the job only changes with the sources, so that the output
+    # of unchanged sources is unchanged. A job is immutable and runs once,
+    # so the finished one is deleted after SNIFFER_JOB_TTL seconds, and
+    # applying the output again before then needs it deleted to re-run.
+    sources_hash = hashlib.sha256()
+    for name in sorted(output.sources):
+        sources_hash.update(name.encode("utf-8"))
+        sources_hash.update(output.sources[name][0].encode("utf-8"))
+    uq_suffix = sources_hash.hexdigest()[:8]
+    sniffer_job = copy.deepcopy(SNIFFER_JOB_BASE)
+    sniffer_job["metadata"]["name"] = f"sniffer-{env}-{uq_suffix}"
+    sniffer_job["metadata"]["generateName"] = f"sniffer-{env}-{uq_suffix}-"
+    sniffer_job["spec"]["ttlSecondsAfterFinished"] = settings.SNIFFER_JOB_TTL
+    write("sniffer_job.yaml", dump_yaml(sniffer_job, sort_keys=False))
+    namespaces = set(output.namespaces) | set(output.bait_namespaces.values())
+    namespaces = ["data-baits", *sorted(namespaces - {"data-baits"})]
+    for namespace in namespaces:
+        namespace_manifest = copy.deepcopy(NAMESPACE_BASE)
+        namespace_manifest["metadata"]["name"] = namespace
+        write(
+            f"{namespace}-namespace.yaml",
+            dump_yaml(namespace_manifest, sort_keys=False),
+        )
+    # the reader skips shards left over from the previous sources
+    secret_data = {}
+    for name in sorted(output.sources):
+        entries = output.sources[name][1]
+        secret_data.update((key, entries[key]) for key in sorted(entries))
+    shards = shard_sources(secret_data, settings.SOURCES_SECRET_MAX_BYTES)
+    secret_files = []
+    for shard_index, shard in enumerate(shards):
+        suffix = f"-{shard_index}" if shard_index else ""
+        secret = copy.deepcopy(SOURCES_SECRET_BASE)
+        secret["metadata"]["name"] = f"data-baits-source-{env}{suffix}"
+        labels = secret["metadata"]["labels"]
+        labels["data-baits-source"] = env
+        labels["data-baits-shard"] = str(shard_index)
+        labels["data-baits-shards"] = str(len(shards))
+        labels["data-baits-sources-hash"] = uq_suffix
+        labels["redeployable-1-name"] = sniffer_job["metadata"]["name"]
+        secret["data"] = shard
+        secret_files.append(f"sources_secret{suffix}.yaml")
+        write(secret_files[-1], dump_yaml(secret, sort_keys=False))
+    stale_files = []
+    if os.path.isdir(output.path):
+        for file_name in os.listdir(output.path):
+            match = re.fullmatch(r"sources_secret-(\d+)\.yaml", file_name)
+            if match and int(match.group(1)) >= len(shards):
+                stale_files.append(file_name)
+    kustomization = copy.deepcopy(KUSTOMIZATION_BASE)
+    kustomization["resources"] = [
+        f"{namespace}-namespace.yaml" for namespace in namespaces
+    ]
+    kustomization["resources"] += [*secret_files, "sniffer_job.yaml"]
+    write("kustomization.yaml", dump_yaml(kustomization, sort_keys=False))
+    return written, skipped, stale_files
+
+
+# environments written by the forked workers of ManifestWriter.flush
+_DUMP_QUEUE: List[Tuple[str, _EnvOutput, str]] = []
+
+
+def _dump_env_in_worker(index: int) -> Tuple[int, int, List[str]]:
+    return _write_env_resources(*_DUMP_QUEUE[index])
+
+
+class ManifestWriter:
+    """Writes the generate output while the baits stream in.
+
+    A bait is serialized once for all its environments and its changed
+    manifest files are staged right away, so that it can be released
+    afterwards. Only the encoded sources are kept until flush() stages
+    the remaining resources of the changed environments, in `workers`
+    processes, and then moves all the staged files to the output. Until
+    then, the output is left untouched, see discard().
+    """
+
+    def __init__(
+        self,
+        path: str,
+        workers: Optional[int] = None,
+        envs: Iterable[str] = (),
+    ):
+        self.path = path
+        self.workers = workers
+        # numbers of the files since the last flush()
+        self.written = 0
+        self.skipped = 0
+        self.removed = 0
+        self._outputs: Dict[str, _EnvOutput] = {}
+        self._dirty: Set[str] = set()
+        # directory of the files staged since the last flush()
+        self._staging: Optional[str] = None
+        # output file -> its staged file
+        self._staged: Dict[str, str] = {}
+        self._staged_count = 0
+        self._removals: Set[str] = set()
+        # environments written even without any baits
+        for env in envs:
+            self._output(env)
+
+    def _output(self, env: str) -> _EnvOutput:
+        if env not in self._outputs:
+            env_path = os.path.join(self.path, env)
+            self._outputs[env] = _EnvOutput(env_path, {}, {}, set())
+        self._dirty.add(env)
+        return self._outputs[env]
+
+    def _staging_path(self) -> str:
+        if self._staging is None:
+            # next to the output, so that the files are moved, not copied
+            path = os.path.abspath(self.path)
+            self._staging = tempfile.mkdtemp(
+                prefix=f".{os.path.basename(path)}-staging-",
+                dir=os.path.dirname(path),
             )
-            with open(destination, "r") as f:
-                bait_manifest_str = bait.dump_to_yaml_str()
-                sources[bait_manifest_name] = base64.b64encode(
-                    bait_manifest_str.encode("utf-8")
-                ).decode("utf-8")
-        namespaces = ["data-baits"]
-        for bait in baits:
-            if getattr(bait, "namespace", None):
-                if bait.namespace not in namespaces:
-                    namespaces.append(bait.namespace)
-        for namespace in namespaces:
-            with open(
-                os.path.join(env_path, f"{namespace}-namespace.yaml"), "w"
-            ) as f:
-                logger.debug(
-                    f"-> Writing a namespace manifest to '{f.name}'..."
-                )
-                namespace_manifest = NAMESPACE_BASE.copy()
-                namespace_manifest["metadata"]["name"] = namespace
-                YAML().dump(namespace_manifest, f)
-        with open(os.path.join(env_path, "sources_secret.yaml"), "w") as f:
-            logger.debug(f"-> Writing a config map manifest to '{f.name}'...")
-            secret["data"] = sources
-            YAML().dump(secret, f)
-        with open(os.path.join(env_path, "kustomization.yaml"), "w") as f:
-            logger.debug(
-                f"-> Writing a kustomization manifest to '{f.name}'..."
+        return self._staging
+
+    def _write(self, file_path: str, content: str) -> None:
+        self._removals.discard(file_path)
+        staged_path = self._staged.get(file_path)
+        if staged_path is None:
+            staged_path = os.path.join(
+                self._staging_path(), str(self._staged_count)
             )
-            kustomization = KUSTOMIZATION_BASE.copy()
-            kustomization["resources"] = [
-                f"{namespace}-namespace.yaml" for namespace in namespaces
-            ]
-            kustomization["resources"] += [
-                "sources_secret.yaml",
-                "sniffer_job.yaml",
-            ]
+        if _write_if_changed(file_path, content, staged_path):
+            self._staged[file_path] = staged_path
+            self._staged_count += 1
+            self.written += 1
+        else:
+            self._staged.pop(file_path, None)
+            self.skipped += 1
 
-            YAML().dump(kustomization, f)
-    logger.info("Done.")
+    def add(self, bait: Bait, envs: List[str]) -> str:
+        """Adds a bait, returns the name of its manifest."""
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        logger.debug(f"-> Dumping bait '{bait.id()}'...")
+        name = f"{bait.id()}{manifest_extension()}"
+        self.add_manifest(
+            name,
+            bait.dump_to_str(),
+            envs,
+            namespace=getattr(bait, "namespace", None),
+        )
+        return name
+
+    def add_manifest(
+        self,
+        name: str,
+        manifest: str,
+        envs: List[str],
+        namespace: Optional[str] = None,
+        checksum: Optional[str] = None,
+    ) -> None:
+        """Adds an already serialized bait manifest, see add()."""
+        checksum = checksum or manifest_checksum(manifest)
+        secret_data = encode_source(
+            name,
+            manifest,
+            checksum,
+            compression=settings.SOURCES_COMPRESSION,
+            max_entry_bytes=settings.SOURCES_SECRET_MAX_BYTES,
+            signing_key=settings.SOURCES_SIGNING_KEY,
+        )
+        for env in envs:
+            output = self._output(env)
+            self._write(os.path.join(output.path, name), manifest)
+            output.sources[name] = (checksum, secret_data)
+            if namespace:
+                output.bait_namespaces[name] = namespace
+
+    def remove_manifest(
+        self, name: str, envs: Optional[Iterable[str]] = None
+    ) -> None:
+        """Removes a bait manifest added before from the environments."""
+        envs = self._outputs if envs is None else envs
+        for env in envs:
+            output = self._outputs.get(env)
+            if output is None or output.sources.pop(name, None) is None:
+                continue
+            output.bait_namespaces.pop(name, None)
+            self._dirty.add(env)
+            file_path = os.path.join(output.path, name)
+            self._staged.pop(file_path, None)
+            if os.path.exists(file_path):
+                self._removals.add(file_path)
+                self.removed += 1
+
+    def add_namespace(self, env: str, namespace: str) -> None:
+        self._output(env).namespaces.add(namespace)
+
+    def flush(self) -> Tuple[int, int]:
+        """Writes the rest of the changed environments.
+
+        Returns the numbers of written and skipped files since the last
+        flush.
+        """
+        global _DUMP_QUEUE
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        _DUMP_QUEUE = []
+        for env in sorted(self._dirty):
+            staging_path = os.path.join(self._staging_path(), f"env-{env}")
+            os.makedirs(staging_path)
+            _DUMP_QUEUE.append((env, self._outputs[env], staging_path))
+        for _, output, _ in _DUMP_QUEUE:
+            logger.info(f"Dumping bait manifests to '{output.path}'...")
+        workers = self.workers or min(len(_DUMP_QUEUE), os.cpu_count() or 1)
+        indices = range(len(_DUMP_QUEUE))
+        try:
+            if workers <= 1 or len(_DUMP_QUEUE) <= 1:
+                results = [_dump_env_in_worker(index) for index in indices]
+            else:
+                # dumping yaml is CPU bound, so environments are written in
+                # forked processes, which inherit the encoded sources
+                if "fork" in multiprocessing.get_all_start_methods():
+                    executor = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context("fork"),
+                    )
+                else:
+                    executor = ThreadPoolExecutor(max_workers=workers)
+                with executor:
+                    results = list(executor.map(_dump_env_in_worker, indices))
+            # the manifests first, the kustomizations referring to them last
+            for (_, output, _), (_, _, stale_files) in zip(
+                _DUMP_QUEUE, results
+            ):
+                for file_name in stale_files:
+                    logger.debug(f"-> Removing stale '{file_name}'...")
+                    self._removals.add(os.path.join(output.path, file_name))
+            self._commit([output.path for _, output, _ in _DUMP_QUEUE])
+            for _, output, staging_path in _DUMP_QUEUE:
+                for file_name in sorted(
+                    os.listdir(staging_path),
+                    key=lambda file_name: file_name == "kustomization.yaml",
+                ):
+                    os.replace(
+                        os.path.join(staging_path, file_name),
+                        os.path.join(output.path, file_name),
+                    )
+            written = sum(written for written, _, _ in results)
+            skipped = sum(skipped for _, skipped, _ in results)
+            written, skipped = written + self.written, skipped + self.skipped
+            removed = self.removed
+        finally:
+            _DUMP_QUEUE = []
+            self.discard()
+        logger.info(
+            f"Done. Written {written} file(s), "
+            f"skipped {skipped} unchanged file(s)"
+            + (f", removed {removed} file(s)." if removed else ".")
+        )
+        return written, skipped
+
+    def _commit(self, env_paths: List[str]) -> None:
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        for env_path in env_paths:
+            if not os.path.exists(env_path):
+                logger.debug(f"Creating directory '{env_path}'...")
+                os.makedirs(env_path, exist_ok=True)
+        for file_path, staged_path in self._staged.items():
+            os.replace(staged_path, file_path)
+        self._staged.clear()
+        for file_path in self._removals:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        self._removals.clear()
+
+    def discard(self) -> None:
+        """Drops the files staged since the last flush(), e.g. after a
+        failure, so that the output stays as it was."""
+        if self._staging is not None:
+            shutil.rmtree(self._staging, ignore_errors=True)
+            self._staging = None
+        self._staged.clear()
+        self._removals.clear()
+        self.written = self.skipped = self.removed = 0
+
+    def close(self) -> Tuple[int, int]:
+        """Writes the rest, returns the numbers of written and skipped."""
+        written, skipped = self.flush()
+        self._outputs.clear()
+        return written, skipped
+
+
+def generate_manifests(
+    paths: List[str],
+    destinations: List[str],
+    output_path: Optional[str] = None,
+    workers: int = 0,
+    timeout: Optional[float] = None,
+    compile: bool = True,
+    jobs: int = 1,
+    cache: Optional[GeneratorCache] = None,
+    compile_cache: Optional[CompileCache] = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> List[str]:
+    """Streams the baits from the generator files to the output path.
+
+    Every bait is discovered, compiled, serialized and staged in turn,
+    and then released, so that the memory does not grow with the number
+    of the baits. The output is only changed once all the generator
+    files ran, e.g. not at all if one fails or generates a duplicate id.
+    Returns the ids of the pipelines failing to compile.
+    """
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    registry = BaitRegistry()
+    writer = ManifestWriter(output_path) if output_path else None
+    failed = []
+    baits = iter_baits(
+        paths,
+        destinations,
+        workers,
+        timeout,
+        compile,
+        cache,
+        shard_index,
+        shard_count,
+    )
+    if compile:
+        logger.info("Compiling baits...")
+        stream = compile_stream(baits, jobs, compile_cache)
+    else:
+        stream = ((bait, envs, None) for bait, envs in baits)
+    try:
+        for bait, envs, error in stream:
+            if error:
+                logger.error(
+                    f"Failed to compile pipeline '{bait.id()}'. "
+                    f"Details:\n{error}"
+                )
+                failed.append(bait.id())
+                if cache:
+                    cache.forget(bait)
+            else:
+                if cache:
+                    cache.record(bait)
+                if writer:
+                    writer.add(bait, envs)
+            registry.remove(bait.id())
+    except BaseException:
+        if writer:
+            writer.discard()
+        raise
+    if compile_cache:
+        compile_cache.evict()
+        compile_cache.report()
+    if cache:
+        cache.save()
+        cache.report()
+    if writer:
+        writer.close()
+    return failed
 
 
 @click.command()
@@ -222,6 +866,99 @@ def dump_bait_manifests(
     help="Path where the compiled bait elements should be written.",
     type=click.Path(exists=True),
 )
+@click.option(
+    "--manifest_format",
+    help="Format of the written bait manifests.",
+    default=None,
+    type=click.Choice(ManifestFormats),
+)
+@click.option(
+    "--jobs",
+    help="Number of processes compiling the pipelines.",
+    type=int,
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--workers",
+    help=(
+        "Run the generator files in this many parallel subprocesses "
+        "instead of in the current process."
+    ),
+    type=int,
+    default=0,
+)
+@click.option(
+    "--timeout",
+    help="Time limit in seconds of a generator file run with --workers.",
+    type=float,
+    default=None,
+)
+@click.option(
+    "--cache",
+    help=(
+        "Reuse the baits of the generator files whose python sources did "
+        "not change. Only the generator files and the local modules they "
+        "import are hashed, so do not use it with generators reading data "
+        "files, environment variables or settings."
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--cache_dir",
+    help="Directory of the cache of the generator outputs, see --cache.",
+    type=click.Path(),
+    default=settings.GENERATE_CACHE_DIR,
+    show_default=True,
+)
+@click.option(
+    "--compile_cache_dir",
+    help="Directory of the cache of the compiled pipelines.",
+    type=click.Path(),
+    default=settings.COMPILE_CACHE_DIR,
+    show_default=True,
+)
+@click.option(
+    "--no_compile_cache",
+    help=(
+        "Compile every pipeline without the cache of the compiled "
+        "pipelines, see --compile_cache_dir. The cache of the generator "
+        "outputs is only used with --cache."
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--shard_index",
+    help="Index of the shard of the generator files to run, from 0.",
+    type=int,
+    default=0,
+    show_default=True,
+)
+@click.option(
+    "--shard_count",
+    help=(
+        "Number of the shards the generator files are split into, "
+        "see the merge command."
+    ),
+    type=int,
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--watch",
+    help=(
+        "Keep running and regenerate the manifests of the generator files "
+        "affected by every change of the input paths."
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--poll_interval",
+    help="Seconds between the checks for changes with --watch.",
+    type=float,
+    default=1.0,
+    show_default=True,
+)
 @click.option(
     "--destinations",
     required=True,
@@ -233,13 +970,81 @@ def generate(
     input_paths,
     compile,
     output_path,
+    manifest_format,
+    jobs,
+    workers,
+    timeout,
+    cache,
+    cache_dir,
+    compile_cache_dir,
+    no_compile_cache,
+    shard_index,
+    shard_count,
+    watch,
+    poll_interval,
     destinations,
 ):
-    """Generates baits based on the generate() method."""
+    """Generates baits based on the generate() method.
+
+    The sniffer job of an environment is renamed, so that it runs again,
+    only when its sources change. A finished job is deleted after
+    DATA_BAITS_SNIFFER_JOB_TTL seconds, before then it must be deleted to
+    run it again with unchanged sources.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise click.BadParameter(
+            f"must be in [0, {shard_count}).", param_hint="--shard_index"
+        )
+    if manifest_format:
+        settings.MANIFEST_FORMAT = manifest_format
     destinations = list(set(destinations))
     paths = list(set(input_paths))
-    env_baits = find_baits(paths, destinations)
-    if compile:
-        compile_baits(env_baits)
-    if output_path:
-        dump_bait_manifests(env_baits, output_path)
+    generator_cache = compile_cache = None
+    if not no_compile_cache:
+        compile_cache = CompileCache(
+            compile_cache_dir, settings.COMPILE_CACHE_MAX_BYTES
+        )
+    if cache:
+        generator_cache = GeneratorCache(
+            cache_dir,
+            destinations,
+            roots=[os.getcwd(), *paths],
+            compile=compile,
+        )
+    if watch:
+        if not output_path:
+            raise click.BadParameter(
+                "is required with --watch.", param_hint="--output_path"
+            )
+        # imported here, as it depends on this module
+        from data_baits.watch import GeneratorWatcher
+
+        GeneratorWatcher(
+            paths,
+            destinations,
+            output_path,
+            compile=compile,
+            jobs=jobs,
+            compile_cache=compile_cache,
+        ).run(poll_interval)
+        return
+    failed = generate_manifests(
+        paths,
+        destinations,
+        output_path,
+        workers=workers,
+        timeout=timeout,
+        compile=compile,
+        jobs=jobs,
+        cache=generator_cache,
+        compile_cache=compile_cache,
+        shard_index=shard_index,
+        shard_count=shard_count,
+    )
+    if failed:
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        logger.error(
+            f"Failed to compile {len(failed)} pipeline(s). "
+            "Please check the logs for details."
+        )
+        exit(1)
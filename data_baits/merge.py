@@ -0,0 +1,107 @@
+from typing import Iterator, List, Tuple
+import logging
+import os
+import click
+from data_baits.core.settings import settings
+from data_baits.core.serialization import load_yaml
+from data_baits.generate import ManifestWriter
+from data_baits.sources import decode_secrets, manifest_checksum
+
+NAMESPACE_SUFFIX = "-namespace.yaml"
+
+
+def _read_env(env_path: str) -> Tuple[List[str], Iterator]:
+    """Returns (namespaces, sources) of an environment written by generate.
+
+    The sources are (label, manifest, checksum, signature) from its
+    sources secrets.
+    """
+    with open(os.path.join(env_path, "kustomization.yaml")) as f:
+        resources = load_yaml(f.read())["resources"]
+    namespaces = [
+        resource[: -len(NAMESPACE_SUFFIX)]
+        for resource in resources
+        if resource.endswith(NAMESPACE_SUFFIX)
+    ]
+    secrets = []
+    for resource in resources:
+        if resource.startswith("sources_secret"):
+            with open(os.path.join(env_path, resource)) as f:
+                secret = load_yaml(f.read())
+            secrets.append((secret["metadata"]["name"], secret["data"]))
+    return namespaces, decode_secrets(secrets)
+
+
+def merge_outputs(
+    input_paths: List[str],
+    output_path: str,
+) -> List[str]:
+    """Merges the outputs of generate shards into the output path.
+
+    Returns the errors, e.g. baits found in several shards, in which case
+    the output is incomplete.
+    """
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    writer = ManifestWriter(output_path)
+    owners = {}
+    errors = []
+    try:
+        for input_path in input_paths:
+            logger.info(f"Merging the shard '{input_path}'...")
+            for env in sorted(os.listdir(input_path)):
+                env_path = os.path.join(input_path, env)
+                if not os.path.isfile(
+                    os.path.join(env_path, "kustomization.yaml")
+                ):
+                    continue
+                namespaces, sources = _read_env(env_path)
+                for namespace in namespaces:
+                    writer.add_namespace(env, namespace)
+                for label, manifest, checksum, _ in sources:
+                    name = label.split("/", 1)[1]
+                    if checksum != manifest_checksum(manifest):
+                        errors.append(f"Checksum of '{label}' does not match.")
+                        continue
+                    owner = owners.setdefault(name, input_path)
+                    if owner != input_path:
+                        errors.append(
+                            f"Found duplicate '{name}' in the shards "
+                            f"'{owner}' and '{input_path}'."
+                        )
+                        continue
+                    writer.add_manifest(
+                        name, manifest, [env], checksum=checksum
+                    )
+        if not errors:
+            writer.close()
+    finally:
+        # nothing is left staged if the merge fails
+        writer.discard()
+    return errors
+
+
+@click.command()
+@click.option(
+    "--input_paths",
+    required=True,
+    help="Output paths of the generate shards.",
+    type=click.Path(exists=True, file_okay=False),
+    multiple=True,
+)
+@click.option(
+    "--output_path",
+    required=True,
+    help="Path where the merged bait elements should be written.",
+    type=click.Path(file_okay=False),
+)
+def merge(input_paths, output_path):
+    """Merges the outputs of generate run with --shard_count."""
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    errors = merge_outputs(list(input_paths), output_path)
+    for error in errors:
+        logger.error(error)
+    if errors:
+        logger.error(
+            f"Failed to merge the shards with {len(errors)} error(s)."
+        )
+        exit(1)
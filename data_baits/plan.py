@@ -0,0 +1,248 @@
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+import json
+import logging
+import os
+import click
+from packaging.version import Version
+from data_baits.core.settings import settings, YamlBackends
+from data_baits.core.serialization import load_manifest
+from data_baits.bait import Bait
+
+# version of the format of the plan files
+PLAN_FORMAT = 1
+# registry entry which is not a deployed bait
+FIRST_DEPLOYMENT = "first_deployment"
+
+T = TypeVar("T")
+
+
+def registry_key(name: str, version: Version) -> str:
+    """Returns the registry entry of a bait (id without version) version."""
+    return f"{name}_{version}"
+
+
+def split_registry_key(key: str) -> Tuple[str, Version]:
+    name, version = key.rsplit("_", 1)
+    return name, Version(version)
+
+
+def deployed_versions(registry_data: Dict[str, Any]) -> Dict[str, Version]:
+    """Returns the latest deployed version of every bait in the registry.
+
+    The entries of the registry are `<bait id without version>_<version>`.
+    """
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    deployed = {}
+    for name_version, deployed_time in (registry_data or {}).items():
+        if name_version == FIRST_DEPLOYMENT:
+            continue
+        name, version = split_registry_key(name_version)
+        logger.debug(
+            f"-> '{name}' version '{version}' was "
+            f"deployed at {deployed_time}."
+        )
+        if name not in deployed or version > deployed[name]:
+            deployed[name] = version
+    return deployed
+
+
+def select_baits(
+    entries: Iterable[Tuple[str, Version, T]],
+    deployed: Dict[str, Version],
+    rollback: bool = False,
+) -> List[T]:
+    """Selects the baits to deploy (or roll back) against the registry.
+
+    The entries are (bait id without version, version, bait) and the
+    selected baits are returned oldest first. A bait is deployed if it
+    was never deployed or is newer than the deployed version, and it is
+    rolled back if it is the deployed version.
+    """
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    selected = []
+    for name, version, bait in sorted(entries, key=lambda entry: entry[1]):
+        deployed_version = deployed.get(name)
+        if rollback:
+            if deployed_version is None:
+                logger.info(
+                    f"-> Bait '{name}' with version "
+                    f"'{version}' was never deployed, skipping..."
+                )
+            elif version == deployed_version:
+                selected.append(bait)
+        elif deployed_version is None:
+            logger.debug(
+                f"--> Found a new bait: '{name}' with version '{version}'."
+            )
+            selected.append(bait)
+        elif version > deployed_version:
+            logger.debug(
+                f"--> Found a newer version of bait: '{name}': "
+                f"{version} > {deployed_version}."
+            )
+            selected.append(bait)
+        else:
+            logger.debug(
+                f"--> Bait '{name}' with version "
+                f"'{version}' was previously deployed."
+            )
+    return selected
+
+
+def load_snapshot(file: str) -> Dict[str, Any]:
+    """Returns the registry data from an exported `sniffer-registry`.
+
+    The file is a ConfigMap or a List of the ConfigMaps of its shards,
+    e.g. from `kubectl get configmaps -l data-baits-registry-shard -o
+    yaml`, or only the registry data.
+    """
+    with open(file) as f:
+        snapshot = load_manifest(f.read()) or {}
+    if snapshot.get("kind") == "List":
+        data = {}
+        for item in snapshot.get("items") or []:
+            data.update(item.get("data") or {})
+        return data
+    if snapshot.get("kind") == "ConfigMap":
+        return snapshot.get("data") or {}
+    return snapshot
+
+
+def _read_manifests(path: str) -> Iterator[Tuple[str, str]]:
+    for root, _, files in os.walk(path):
+        for file in sorted(files):
+            if file.endswith((".yaml", ".yml", ".json")):
+                file_path = os.path.join(root, file)
+                with open(file_path) as f:
+                    yield file_path, f.read()
+
+
+def _plan_entry(
+    label: str, manifest: str
+) -> Optional[Tuple[str, Version, dict]]:
+    """Returns the entry of a bait manifest or None for other manifests."""
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    # only the header is used, so the fastest parser is good enough
+    data = load_manifest(manifest, YamlBackends.libyaml)
+    if (
+        not isinstance(data, dict)
+        or "kind" in data
+        or "name" not in data
+        or "type" not in data
+    ):
+        logger.debug(f"-> Skipping '{label}', not a bait manifest.")
+        return None
+    if "version" in data:
+        data["version"] = str(data["version"])
+    # the id of some baits depends on more than their name, e.g. on the
+    # namespace of databases, so it is built by their class, unvalidated
+    bait = Bait.bait_class(data["type"]).model_construct(**data)
+    name, version = bait.id(use_version=False), bait.version
+    return (
+        name,
+        version,
+        {
+            "id": bait.id(),
+            "type": bait.type,
+            "version": str(version),
+            "source": label,
+            "manifest": manifest,
+        },
+    )
+
+
+def make_plan(
+    sources: Iterable[Tuple[str, str]],
+    registry_data: Dict[str, Any],
+    rollback: bool = False,
+) -> Dict[str, Any]:
+    """Makes a deployment plan of the manifests against the registry.
+
+    The sources are (label, manifest) and only the headers of the
+    manifests are read, the baits are validated by `deploy --plan`. The
+    plan keeps the deployed versions, so that it is not executed against
+    a registry changed in the meantime.
+    """
+    deployed = deployed_versions(registry_data)
+    entries = [
+        entry
+        for entry in (
+            _plan_entry(label, manifest) for label, manifest in sources
+        )
+        if entry is not None
+    ]
+    return {
+        "format": PLAN_FORMAT,
+        "rollback": rollback,
+        "registry": {name: str(version) for name, version in deployed.items()},
+        "baits": select_baits(entries, deployed, rollback),
+    }
+
+
+def check_plan(plan: Dict[str, Any], deployed: Dict[str, Version]) -> None:
+    """Raises ValueError if the plan cannot be executed on the registry."""
+    if plan.get("format") != PLAN_FORMAT:
+        raise ValueError(
+            f"Unsupported plan format '{plan.get('format')}', "
+            f"expected '{PLAN_FORMAT}'."
+        )
+    planned = {
+        name: Version(version) for name, version in plan["registry"].items()
+    }
+    if planned != deployed:
+        changed = sorted(
+            name
+            for name in planned.keys() | deployed.keys()
+            if planned.get(name) != deployed.get(name)
+        )
+        raise ValueError(
+            "The registry has changed since the plan was made, "
+            f"e.g. for {', '.join(changed[:5])}. Please make a new plan."
+        )
+
+
+@click.command()
+@click.option(
+    "--path",
+    required=True,
+    help="Path where the bait manifests are.",
+    type=click.Path(exists=True),
+)
+@click.option(
+    "--registry",
+    required=True,
+    help="Exported sniffer-registry ConfigMaps (or data) to plan against.",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--rollback",
+    help="Plan the rollback of the selected baits.",
+    is_flag=True,
+)
+@click.option(
+    "--output",
+    required=True,
+    help="File where the plan is written.",
+    type=click.Path(dir_okay=False),
+)
+def plan(path, registry, rollback, output):
+    """Plans a deployment offline, see deploy --plan."""
+    logger = logging.getLogger(settings.LOGGER_NAME)
+    deployment_plan = make_plan(
+        _read_manifests(path), load_snapshot(registry), rollback
+    )
+    with open(output, "w") as f:
+        json.dump(deployment_plan, f, indent=2)
+    action = "roll back" if rollback else "deploy"
+    logger.info(
+        f"Planned to {action} {len(deployment_plan['baits'])} bait(s)."
+    )
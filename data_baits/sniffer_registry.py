@@ -0,0 +1,229 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+import bisect
+import logging
+import threading
+from kubernetes import client
+from packaging.version import Version
+from data_baits.core.settings import settings
+from data_baits.plan import FIRST_DEPLOYMENT, registry_key, split_registry_key
+
+REGISTRY_NAME = "sniffer-registry"
+REGISTRY_NAMESPACE = "data-baits"
+# every shard is labelled with its index, so that all are listed at once
+SHARD_LABEL = "data-baits-registry-shard"
+
+
+def _data_size(data: Dict[str, str]) -> int:
+    return sum(len(key) + len(value) for key, value in data.items())
+
+
+class SnifferRegistry:
+    """The deployed baits, stored in the sniffer-registry ConfigMaps.
+
+    Every entry `<bait id without version>_<version>` maps to the time of
+    its deployment. The entries are spread over shards (`sniffer-registry`,
+    `sniffer-registry-1`, ...) of at most `max_bytes` and every write is
+    a patch of the entries changed, conditional on the resourceVersion of
+    the shard, so that concurrent sniffers do not overwrite each other.
+    """
+
+    def __init__(
+        self,
+        v1: client.CoreV1Api,
+        namespace: str = REGISTRY_NAMESPACE,
+        max_bytes: int = None,
+        retries: int = 5,
+    ):
+        self.v1 = v1
+        self.namespace = namespace
+        self.max_bytes = max_bytes or settings.REGISTRY_SHARD_MAX_BYTES
+        self.retries = retries
+        self.first_deployment: Optional[str] = None
+        self._lock = threading.RLock()
+        # shard name -> (resourceVersion, data), in the order of the shards
+        self._shards: Dict[str, tuple[str, Dict[str, str]]] = {}
+        # entry -> name of its shard
+        self._owners: Dict[str, str] = {}
+        # bait id without version -> deployed versions, sorted
+        self._versions: Dict[str, List[Version]] = {}
+
+    @staticmethod
+    def shard_name(index: int) -> str:
+        return REGISTRY_NAME if index == 0 else f"{REGISTRY_NAME}-{index}"
+
+    def load(self) -> "SnifferRegistry":
+        """Reads the shards of the registry, creating it if needed."""
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        with self._lock:
+            try:
+                first = self.v1.read_namespaced_config_map(
+                    name=REGISTRY_NAME, namespace=self.namespace
+                )
+                logger.debug("-> Registry found!")
+            except client.exceptions.ApiException as e:
+                if e.status != 404:
+                    raise
+                logger.debug("-> Creating the registry...")
+                try:
+                    first = self._create(
+                        0, {FIRST_DEPLOYMENT: datetime.utcnow().isoformat()}
+                    )
+                except client.exceptions.ApiException as e:
+                    if e.status != 409:
+                        raise
+                    # created by another sniffer in the meantime
+                    first = self.v1.read_namespaced_config_map(
+                        name=REGISTRY_NAME, namespace=self.namespace
+                    )
+            if SHARD_LABEL not in (first.metadata.labels or {}):
+                # registries created before the sharding
+                first = self.v1.patch_namespaced_config_map(
+                    name=REGISTRY_NAME,
+                    namespace=self.namespace,
+                    body={"metadata": {"labels": {SHARD_LABEL: "0"}}},
+                )
+            self._shards.clear()
+            self._owners.clear()
+            self._versions.clear()
+            self._set_shard(first)
+            shards = self.v1.list_namespaced_config_map(
+                namespace=self.namespace, label_selector=SHARD_LABEL
+            ).items
+            shards = sorted(
+                (
+                    shard
+                    for shard in shards
+                    if shard.metadata.name != REGISTRY_NAME
+                ),
+                key=lambda shard: int(shard.metadata.labels[SHARD_LABEL]),
+            )
+            for shard in shards:
+                self._set_shard(shard)
+            self.first_deployment = (first.data or {}).get(FIRST_DEPLOYMENT)
+        return self
+
+    def _create(self, index: int, data: Dict[str, str]) -> client.V1ConfigMap:
+        return self.v1.create_namespaced_config_map(
+            namespace=self.namespace,
+            body={
+                "apiVersion": "v1",
+                "kind": "ConfigMap",
+                "metadata": {
+                    "name": self.shard_name(index),
+                    "labels": {SHARD_LABEL: str(index)},
+                },
+                "data": data,
+            },
+        )
+
+    def _set_shard(self, config_map: client.V1ConfigMap) -> None:
+        shard = config_map.metadata.name
+        data = dict(config_map.data or {})
+        _, previous = self._shards.get(shard, (None, {}))
+        for key in previous:
+            if key != FIRST_DEPLOYMENT and self._owners.get(key) == shard:
+                del self._owners[key]
+                name, version = split_registry_key(key)
+                versions = self._versions[name]
+                versions.remove(version)
+                if not versions:
+                    del self._versions[name]
+        for key in data:
+            if key != FIRST_DEPLOYMENT and key not in self._owners:
+                self._owners[key] = shard
+                name, version = split_registry_key(key)
+                bisect.insort(self._versions.setdefault(name, []), version)
+        self._shards[shard] = (config_map.metadata.resource_version, data)
+
+    def latest(self, name: str) -> Optional[Version]:
+        """Returns the latest deployed version of a bait."""
+        versions = self._versions.get(name)
+        return versions[-1] if versions else None
+
+    def versions(self, name: str) -> List[Version]:
+        return list(self._versions.get(name, []))
+
+    def deployed(self) -> Dict[str, Version]:
+        """Returns the latest deployed version of every bait."""
+        return {
+            name: versions[-1] for name, versions in self._versions.items()
+        }
+
+    def entries(self) -> Dict[str, str]:
+        """Returns the entries of all the shards, as a single registry."""
+        entries = {}
+        for _, data in self._shards.values():
+            entries.update(data)
+        return entries
+
+    def _shard_with_room(self, size: int) -> str:
+        for shard, (_, data) in self._shards.items():
+            if _data_size(data) + size <= self.max_bytes:
+                return shard
+        index = len(self._shards)
+        try:
+            self._set_shard(self._create(index, {}))
+        except client.exceptions.ApiException as e:
+            if e.status != 409:
+                raise
+            # created by another sniffer in the meantime
+            self._set_shard(
+                self.v1.read_namespaced_config_map(
+                    name=self.shard_name(index), namespace=self.namespace
+                )
+            )
+        return self.shard_name(index)
+
+    def _patch(self, shard: str, changes: Dict[str, Optional[str]]) -> None:
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        for _ in range(self.retries):
+            resource_version, _ = self._shards[shard]
+            try:
+                self._set_shard(
+                    self.v1.patch_namespaced_config_map(
+                        name=shard,
+                        namespace=self.namespace,
+                        body={
+                            "metadata": {"resourceVersion": resource_version},
+                            "data": changes,
+                        },
+                    )
+                )
+                return
+            except client.exceptions.ApiException as e:
+                if e.status != 409:
+                    raise
+            logger.debug(f"-> Registry shard '{shard}' changed, retrying...")
+            self._set_shard(
+                self.v1.read_namespaced_config_map(
+                    name=shard, namespace=self.namespace
+                )
+            )
+        raise ValueError(
+            f"Failed to update the registry shard '{shard}' "
+            f"after {self.retries} conflicting updates."
+        )
+
+    def add(
+        self,
+        name: str,
+        version: Version,
+        deployed_at: Optional[datetime] = None,
+    ) -> None:
+        """Records the deployment of a bait version."""
+        key = registry_key(name, version)
+        value = (deployed_at or datetime.utcnow()).isoformat()
+        with self._lock:
+            shard = self._owners.get(key)
+            if shard is None:
+                shard = self._shard_with_room(len(key) + len(value))
+            self._patch(shard, {key: value})
+
+    def remove(self, name: str, version: Version) -> None:
+        """Removes the record of a bait version, e.g. after its rollback."""
+        key = registry_key(name, version)
+        with self._lock:
+            shard = self._owners.get(key)
+            if shard is not None:
+                self._patch(shard, {key: None})
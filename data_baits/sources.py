@@ -0,0 +1,219 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import base64
+import gzip
+import hashlib
+import hmac
+import re
+from data_baits.core.settings import SourcesCompressions
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is used by default
+    zstandard = None
+
+# suffix of the secret entries holding the checksum of a manifest
+CHECKSUM_SUFFIX = ".sha256"
+# suffix of the secret entries holding the signature of a manifest
+SIGNATURE_SUFFIX = ".hmac"
+# suffixes of the secret entries holding compressed manifests
+COMPRESSION_SUFFIXES = {
+    SourcesCompressions.gzip: ".gz",
+    SourcesCompressions.zstd: ".zst",
+}
+# an entry too big for a secret is split into the parts with this suffix
+_PART_SUFFIX = re.compile(r"\.part-(\d+)-of-(\d+)$")
+
+
+def manifest_checksum(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def manifest_signature(content: str, key: str) -> str:
+    """Returns the HMAC-SHA256 of a manifest with the signing key."""
+    return hmac.new(
+        key.encode("utf-8"), content.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def _b64encode(value: str) -> str:
+    return base64.b64encode(value.encode("utf-8")).decode("utf-8")
+
+
+def _b64decode(value: str) -> str:
+    return base64.b64decode(value.encode("utf-8")).decode("utf-8")
+
+
+def _compress(content: bytes, compression: SourcesCompressions) -> bytes:
+    if compression == SourcesCompressions.gzip:
+        # no timestamp, so that the output only depends on the content
+        return gzip.compress(content, mtime=0)
+    if compression == SourcesCompressions.zstd:
+        if zstandard is None:
+            raise ValueError("zstd compression requires 'zstandard'.")
+        return zstandard.ZstdCompressor().compress(content)
+    return content
+
+
+def _decompress(content: bytes, compression: SourcesCompressions) -> bytes:
+    if compression == SourcesCompressions.gzip:
+        return gzip.decompress(content)
+    if compression == SourcesCompressions.zstd:
+        if zstandard is None:
+            raise ValueError("zstd compressed sources require 'zstandard'.")
+        return zstandard.ZstdDecompressor().decompress(content)
+    return content
+
+
+def encode_source(
+    name: str,
+    manifest: str,
+    checksum: Optional[str] = None,
+    compression: SourcesCompressions = SourcesCompressions.none,
+    max_entry_bytes: Optional[int] = None,
+    signing_key: Optional[str] = None,
+) -> Dict[str, str]:
+    """Encodes a bait manifest as entries of a sources secret data.
+
+    The manifest is compressed and, if its encoded entry would take more
+    than `max_entry_bytes`, split into parts which are joined again by
+    `decode_secrets`. With a `signing_key`, its signature is stored too.
+    """
+    compression = SourcesCompressions(compression)
+    entry_name = f"{name}{COMPRESSION_SUFFIXES.get(compression, '')}"
+    content = _compress(manifest.encode("utf-8"), compression)
+    # base64 encodes every 3 bytes as 4 characters
+    part_size = max(3, (max_entry_bytes or 0) * 3 // 4 // 3 * 3)
+    if max_entry_bytes is None or len(content) <= part_size:
+        parts = {entry_name: content}
+    else:
+        chunks = []
+        for start in range(0, len(content), part_size):
+            end = start + part_size
+            chunks.append(content[start:end])
+        parts = {
+            f"{entry_name}.part-{index:03d}-of-{len(chunks):03d}": chunk
+            for index, chunk in enumerate(chunks)
+        }
+    data = {
+        part_name: base64.b64encode(part).decode("utf-8")
+        for part_name, part in parts.items()
+    }
+    data[f"{name}{CHECKSUM_SUFFIX}"] = _b64encode(
+        checksum or manifest_checksum(manifest)
+    )
+    if signing_key:
+        data[f"{name}{SIGNATURE_SUFFIX}"] = _b64encode(
+            manifest_signature(manifest, signing_key)
+        )
+    return data
+
+
+def encode_sources(
+    manifests: Dict[str, str],
+    compression: SourcesCompressions = SourcesCompressions.none,
+    signing_key: Optional[str] = None,
+) -> Dict[str, str]:
+    """Encodes bait manifests as the data of a sources secret.
+
+    Every manifest is stored next to its checksum and, with a
+    `signing_key`, its signature, which marks it as validated by
+    generate, see `Bait.yaml_str_to_bait`.
+    """
+    data = {}
+    for name, manifest in manifests.items():
+        data.update(
+            encode_source(
+                name,
+                manifest,
+                compression=compression,
+                signing_key=signing_key,
+            )
+        )
+    return data
+
+
+def shard_sources(
+    data: Dict[str, str], max_bytes: int
+) -> List[Dict[str, str]]:
+    """Splits the data of a sources secret into the data of many secrets.
+
+    The entries are packed in order, so that every shard takes at most
+    `max_bytes`, unless a single entry is bigger than that.
+    """
+    shards = [{}]
+    size = 0
+    for name, value in data.items():
+        entry_size = len(name) + len(value)
+        if shards[-1] and size + entry_size > max_bytes:
+            shards.append({})
+            size = 0
+        shards[-1][name] = value
+        size += entry_size
+    return shards
+
+
+def _split_entry_name(
+    name: str,
+) -> Tuple[str, SourcesCompressions, int, int]:
+    """Returns (manifest name, compression, part, parts) of an entry."""
+    index, count = 0, 1
+    match = _PART_SUFFIX.search(name)
+    if match:
+        index, count = int(match.group(1)), int(match.group(2))
+        name = name[: match.start()]
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffix):
+            return name[: -len(suffix)], compression, index, count
+    return name, SourcesCompressions.none, index, count
+
+
+def decode_secrets(
+    secrets: Iterable[Tuple[str, Dict[str, str]]],
+) -> Iterator[Tuple[str, str, Optional[str], Optional[str]]]:
+    """Yields (label, manifest, checksum, signature) of the sources secrets.
+
+    The secrets are given as (name, data) and the parts of a manifest
+    may be spread over several of them, see `shard_sources`.
+    """
+    manifests = {}
+    checksums = {}
+    signatures = {}
+    for secret_name, data in secrets:
+        for entry_name, encoded in (data or {}).items():
+            if entry_name.endswith(CHECKSUM_SUFFIX):
+                name = entry_name[: -len(CHECKSUM_SUFFIX)]
+                checksums[name] = _b64decode(encoded)
+                continue
+            if entry_name.endswith(SIGNATURE_SUFFIX):
+                name = entry_name[: -len(SIGNATURE_SUFFIX)]
+                signatures[name] = _b64decode(encoded)
+                continue
+            name, compression, index, count = _split_entry_name(entry_name)
+            label, _, _, parts = manifests.setdefault(
+                name, [f"{secret_name}/{name}", compression, count, {}]
+            )
+            parts[index] = encoded
+    for name, (label, compression, count, parts) in manifests.items():
+        if sorted(parts) != list(range(count)):
+            raise ValueError(
+                f"Source '{label}' is incomplete, "
+                f"found {len(parts)} out of {count} part(s)."
+            )
+        content = b"".join(
+            base64.b64decode(parts[index].encode("utf-8"))
+            for index in range(count)
+        )
+        yield (
+            label,
+            _decompress(content, compression).decode("utf-8"),
+            checksums.get(name),
+            signatures.get(name),
+        )
+
+
+def decode_sources(
+    secret_name: str,
+    data: Dict[str, str],
+) -> Iterator[Tuple[str, str, Optional[str], Optional[str]]]:
+    """Yields (label, manifest, checksum, signature) of a secret data."""
+    return decode_secrets([(secret_name, data)])
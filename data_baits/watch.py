@@ -0,0 +1,201 @@
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+import os
+import sys
+import time
+from data_baits.bait import BaitRegistry
+from data_baits.cache import CompileCache, local_dependencies
+from data_baits.core.settings import settings
+from data_baits.generate import (
+    ManifestWriter,
+    compile_stream,
+    execute_generator,
+    find_generator_files,
+)
+
+
+class GeneratorWatcher:
+    """Regenerates the manifests of the generator files as they change.
+
+    The files are polled, and only the generator files depending on the
+    changed files (see local_dependencies) are run again, in this
+    process, so the imports stay warm between the changes.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        destinations: List[str],
+        output_path: str,
+        compile: bool = True,
+        jobs: int = 1,
+        compile_cache: Optional[CompileCache] = None,
+    ):
+        self.paths = paths
+        self.destinations = destinations
+        self.roots = [os.path.abspath(root) for root in [os.getcwd(), *paths]]
+        self.compile = compile
+        self.jobs = jobs
+        self.compile_cache = compile_cache
+        self.writer = ManifestWriter(output_path)
+        # generator file -> {bait id -> (manifest name, destinations)}
+        self._manifests: Dict[str, Dict[str, Tuple[str, List[str]]]] = {}
+        # generator file -> local files it depends on, itself included
+        self._dependencies: Dict[str, Set[str]] = {}
+        # file -> (modification time, size)
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+
+    def _generator_files(self) -> Set[str]:
+        return {
+            os.path.abspath(file)
+            for file in find_generator_files(self.paths, verbose=False)
+        }
+
+    def scan(self) -> Set[str]:
+        """Returns the files modified, added or removed since the last scan.
+
+        The dependencies found by the last update are tracked from then on.
+        """
+        generator_files = self._generator_files()
+        tracked = set(generator_files)
+        for dependencies in self._dependencies.values():
+            tracked |= dependencies
+        snapshot = {}
+        for file in tracked:
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            snapshot[file] = (stat.st_mtime_ns, stat.st_size)
+        changed = {
+            file
+            for file in snapshot
+            if file in self._snapshot
+            and snapshot[file] != self._snapshot[file]
+            or file not in self._snapshot
+            and file in generator_files
+        }
+        changed |= set(self._snapshot) - set(snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def update(self, changed: Set[str]) -> int:
+        """Runs the generator files affected by the changed files again.
+
+        Returns the number of the generator files run.
+        """
+        generator_files = self._generator_files()
+        affected = sorted(
+            file
+            for file in generator_files
+            if file not in self._dependencies
+            or self._dependencies[file] & changed
+        )
+        for file in set(self._dependencies) - generator_files:
+            self._forget(file)
+        # the local modules imported by the affected files are imported
+        # again, so that they see the changes too
+        stale_modules = set(changed)
+        for file in affected:
+            stale_modules |= self._dependencies.get(file, set())
+        for name, module in list(sys.modules.items()):
+            module_file = getattr(module, "__file__", None)
+            if module_file and os.path.abspath(module_file) in stale_modules:
+                del sys.modules[name]
+        with BaitRegistry.scope():
+            for file in affected:
+                self._run(file)
+        self.writer.flush()
+        return len(affected)
+
+    def _forget(self, file: str) -> None:
+        for name, _ in self._manifests.pop(file, {}).values():
+            self.writer.remove_manifest(name)
+        self._dependencies.pop(file, None)
+
+    def _run(self, file: str) -> None:
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        logger.info(f"-> Running '{file}'...")
+        self._dependencies[file] = local_dependencies(file, self.roots)
+        try:
+            local_baits = execute_generator(file)
+        except Exception as e:
+            logger.error(
+                f"Failed to generate baits/traps from '{file}', "
+                f"keeping its previous manifests. Details:\n{e}"
+            )
+            return
+        owners = {
+            bait_id: owner
+            for owner, manifests in self._manifests.items()
+            for bait_id in manifests
+            if owner != file
+        }
+        selected = []
+        for bait in local_baits or []:
+            envs = [
+                env for env in bait.destinations if env in self.destinations
+            ]
+            if not envs:
+                continue
+            if bait.id() in owners:
+                logger.error(
+                    f"Found duplicate id '{bait.id()}' in '{file}' "
+                    f"and '{owners[bait.id()]}'. Skipping..."
+                )
+                continue
+            selected.append((bait, envs))
+        if self.compile:
+            stream = compile_stream(selected, self.jobs, self.compile_cache)
+        else:
+            stream = ((bait, envs, None) for bait, envs in selected)
+        previous = self._manifests.get(file, {})
+        manifests = {}
+        for bait, envs, error in stream:
+            if error:
+                logger.error(
+                    f"Failed to compile pipeline '{bait.id()}'. "
+                    f"Details:\n{error}"
+                )
+                if bait.id() in previous:
+                    manifests[bait.id()] = previous[bait.id()]
+                continue
+            name = self.writer.add(bait, envs)
+            manifests[bait.id()] = (name, envs)
+        for bait_id, (name, envs) in previous.items():
+            if bait_id not in manifests:
+                self.writer.remove_manifest(name)
+            else:
+                stale_envs = set(envs) - set(manifests[bait_id][1])
+                self.writer.remove_manifest(name, stale_envs)
+        self._manifests[file] = manifests
+
+    def run(self, interval: float = 1.0) -> None:
+        """Watches the files until interrupted, polling every `interval`."""
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        try:
+            while True:
+                changed = self.scan()
+                if changed:
+                    started = time.time()
+                    last_change = max(
+                        [
+                            self._snapshot[file][0] / 1e9
+                            for file in changed
+                            if file in self._snapshot
+                        ],
+                        default=started,
+                    )
+                    files_no = self.update(changed)
+                    if self.compile_cache:
+                        self.compile_cache.evict()
+                    finished = time.time()
+                    logger.info(
+                        f"Regenerated {files_no} generator file(s) in "
+                        f"{(finished - started) * 1000:.0f} ms, "
+                        f"{(finished - last_change) * 1000:.0f} ms after "
+                        "the change. Watching for changes..."
+                    )
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            logger.info("Stopped watching.")
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+
+class FakeClient:
+    """Lists the pipelines and versions in pages of two."""
+
+    def __init__(self, pipelines, versions):
+        self.pipelines = pipelines
+        self.versions = versions
+        self.calls = []
+
+    @staticmethod
+    def _page(items, page_token, page_size, attribute):
+        start = int(page_token or 0)
+        end = start + page_size
+        next_page_token = str(end) if end < len(items) else ""
+        return SimpleNamespace(
+            **{attribute: items[start:end]}, next_page_token=next_page_token
+        )
+
+    def list_pipelines(self, page_token="", page_size=10):
+        self.calls.append(("pipelines", page_token))
+        return self._page(self.pipelines, page_token, page_size, "pipelines")
+
+    def list_pipeline_versions(self, pipeline_id, page_token="", page_size=10):
+        self.calls.append((pipeline_id, page_token))
+        return self._page(
+            self.versions.get(pipeline_id, []),
+            page_token,
+            page_size,
+            "pipeline_versions",
+        )
+
+
+def pipeline(name, pipeline_id):
+    return SimpleNamespace(display_name=name, pipeline_id=pipeline_id)
+
+
+def version(name, version_id):
+    return SimpleNamespace(display_name=name, pipeline_version_id=version_id)
+
+
+def test_catalogue_pages_through_everything_once():
+    from data_baits.catalogue import PipelineCatalogue
+
+    client = FakeClient(
+        [pipeline(f"pipeline-{i}", f"id-{i}") for i in range(5)],
+        {
+            "id-4": [
+                version("pipeline-4", "v-default"),
+                version("0.1.0", "v-1"),
+                version("0.2.0", "v-2"),
+            ]
+        },
+    )
+    catalogue = PipelineCatalogue(client, page_size=2)
+    assert catalogue.pipeline_id("pipeline-4") == "id-4"
+    assert catalogue.pipeline_id("pipeline-0") == "id-0"
+    assert catalogue.pipeline_id("missing") is None
+    assert catalogue.version_ids("pipeline-4", "0.2.0") == ["v-2"]
+    assert catalogue.version_ids("pipeline-4", "0.1.0") == ["v-1"]
+    assert client.calls == [
+        ("pipelines", ""),
+        ("pipelines", "2"),
+        ("pipelines", "4"),
+        ("id-4", ""),
+        ("id-4", "2"),
+    ]
+
+    catalogue.remove_version("pipeline-4", "v-2")
+    catalogue.add_version("pipeline-4", "0.3.0", "v-3")
+    assert [name for name, _ in catalogue.versions("pipeline-4")] == [
+        "pipeline-4",
+        "0.1.0",
+        "0.3.0",
+    ]
+    catalogue.add_pipeline("pipeline-5", "id-5")
+    assert catalogue.pipeline_id("pipeline-5") == "id-5"
+    catalogue.remove_pipeline("pipeline-0")
+    assert catalogue.pipeline_id("pipeline-0") is None
+    assert len(client.calls) == 5
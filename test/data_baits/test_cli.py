@@ -0,0 +1,51 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = ["kfp", "kubernetes", "sqlmodel", "inflect", "pyfiglet"]
+
+
+def loaded_modules(code: str) -> set[str]:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys\n{code}\nprint(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_cli_help_does_not_import_heavy_dependencies():
+    modules = loaded_modules(
+        "from data_baits.__main__ import cli\n"
+        "try:\n"
+        "    cli(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass"
+    )
+    assert "data_baits.__main__" in modules
+    assert not modules & set(HEAVY_MODULES)
+
+
+def test_baits_are_imported_per_type():
+    modules = loaded_modules("from data_baits.baits import Trap")
+    assert "data_baits.baits.trap" in modules
+    assert not modules & {"kfp", "sqlmodel", "data_baits.baits.pipeline"}
+
+
+def test_deploy_parses_the_sources_serially_by_default():
+    from data_baits.deploy import deploy
+
+    workers = next(p for p in deploy.params if p.name == "workers")
+    assert workers.default == 1
+
+
+def test_lazy_commands_short_help_matches_their_docstrings():
+    from data_baits.__main__ import cli
+
+    for name, (_, short_help) in cli.lazy_subcommands.items():
+        command = cli.get_command(None, name)
+        assert short_help == command.help.splitlines()[0], name
@@ -0,0 +1,59 @@
+import threading
+import time
+
+
+def test_running_stages_keeps_ordering():
+    from data_baits.bait import Bait, BaitRegistry
+    from data_baits.executor import run_stages
+
+    with BaitRegistry.scope():
+        first_stage = [
+            Bait(name=f"stage-{name}", version=version, destinations=["e"])
+            for version in ["0.1.0", "0.2.0", "0.3.0"]
+            for name in ["a", "b", "c", "d"]
+        ]
+        second_stage = [
+            Bait(name="stage-e", destinations=["e"]),
+            Bait(name="stage-failing", destinations=["e"]),
+        ]
+        events = []
+        running = set()
+        overlapped = threading.Event()
+        lock = threading.Lock()
+
+        def action(bait):
+            with lock:
+                events.append(("start", bait.id()))
+                if running:
+                    overlapped.set()
+                running.add(bait.id())
+            time.sleep(0.01)
+            with lock:
+                running.discard(bait.id())
+                events.append(("end", bait.id()))
+            if bait.name == "stage-failing":
+                raise RuntimeError("failed")
+            return True
+
+        results = run_stages([first_stage, second_stage], action, 4)
+    assert overlapped.is_set()
+    assert [result.bait for result in results] == first_stage + second_stage
+    assert [result.passed for result in results] == [True] * 13 + [False]
+    assert "RuntimeError" in results[-1].error
+    position = {event: index for index, event in enumerate(events)}
+    for bait in first_stage:
+        # the second stage starts after the first one has finished
+        assert (
+            position[("end", bait.id())]
+            < position[("start", "bait-stage-e-0.1.0")]
+        )
+    for name in "abcd":
+        # older versions of the same bait end before newer ones start
+        assert (
+            position[("end", f"bait-stage-{name}-0.1.0")]
+            < position[("start", f"bait-stage-{name}-0.2.0")]
+        )
+        assert (
+            position[("end", f"bait-stage-{name}-0.2.0")]
+            < position[("start", f"bait-stage-{name}-0.3.0")]
+        )
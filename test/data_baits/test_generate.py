@@ -0,0 +1,430 @@
+import os
+import sys
+import pytest
+
+GENERATOR = """
+from data_baits.baits import SQLiteDatabase
+
+
+def generate():
+    return [
+        SQLiteDatabase(name="{name}", destinations={destinations}),
+    ]
+"""
+
+
+def write_generator(path, file, name, destinations=("env1",), body=None):
+    with open(os.path.join(path, file), "w") as f:
+        f.write(
+            body
+            or GENERATOR.format(name=name, destinations=list(destinations))
+        )
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_finding_baits(tmp_path, workers):
+    from data_baits.bait import BaitRegistry
+    from data_baits.generate import iter_baits
+
+    write_generator(tmp_path, "first.py", "first")
+    write_generator(tmp_path, "second.py", "second", ("env1", "env2"))
+    write_generator(tmp_path, "ignored.py", "ignored", ("other",))
+    write_generator(tmp_path, "helpers.py", None, body="VALUE = 1\n")
+    with BaitRegistry.scope() as registry:
+        baits = iter_baits([str(tmp_path)], ["env1", "env2"], workers)
+        found = {bait.name: envs for bait, envs in baits}
+    assert found == {"first": ["env1"], "second": ["env1", "env2"]}
+    assert registry.get("first") is not None
+
+
+def test_finding_baits_with_workers_reports_timeouts(tmp_path):
+    from data_baits.bait import BaitRegistry
+    from data_baits.generate import iter_baits
+
+    write_generator(tmp_path, "fast.py", "fast")
+    write_generator(
+        tmp_path,
+        "slow.py",
+        None,
+        body="import time\n\n\ndef generate():\n    time.sleep(60)\n",
+    )
+    with BaitRegistry.scope():
+        with pytest.raises(ValueError, match="1 generator file"):
+            list(iter_baits([str(tmp_path)], ["env1"], workers=2, timeout=1))
+
+
+def test_finding_duplicated_baits(tmp_path):
+    from data_baits.bait import BaitRegistry
+    from data_baits.generate import iter_baits
+
+    write_generator(tmp_path, "first.py", "duplicated")
+    write_generator(tmp_path, "second.py", "duplicated")
+    with BaitRegistry.scope():
+        with pytest.raises(ValueError, match="duplicated"):
+            list(iter_baits([str(tmp_path)], ["env1"], workers=2))
+
+
+def test_failing_generate_leaves_the_output_untouched(tmp_path):
+    from data_baits.bait import BaitRegistry
+    from data_baits.generate import generate_manifests
+
+    sources = tmp_path / "sources"
+    output = tmp_path / "output"
+    sources.mkdir()
+    output.mkdir()
+    write_generator(sources, "first.py", "first")
+    with BaitRegistry.scope():
+        generate_manifests([str(sources)], ["env1"], str(output))
+    files = {
+        file: (output / "env1" / file).read_text()
+        for file in os.listdir(output / "env1")
+    }
+    write_generator(sources, "first.py", "renamed")
+    write_generator(sources, "second.py", "renamed")
+    with BaitRegistry.scope():
+        with pytest.raises(ValueError, match="duplicate"):
+            generate_manifests([str(sources)], ["env1"], str(output))
+    assert {
+        file: (output / "env1" / file).read_text()
+        for file in os.listdir(output / "env1")
+    } == files
+    # nothing is left staged
+    assert sorted(os.listdir(tmp_path)) == ["output", "sources"]
+
+
+def test_generator_cache(tmp_path):
+    from data_baits.bait import BaitRegistry
+    from data_baits.cache import GeneratorCache
+    from data_baits.generate import iter_baits
+
+    sources = tmp_path / "sources"
+    (sources / "helpers").mkdir(parents=True)
+    (sources / "helpers" / "__init__.py").write_text("")
+    (sources / "helpers" / "names.py").write_text("NAME = 'cached'\n")
+    (sources / "generator.py").write_text(
+        "from helpers.names import NAME\n"
+        + GENERATOR.replace('"{name}"', "NAME").format(destinations=["env1"])
+    )
+
+    def run():
+        cache = GeneratorCache(
+            str(tmp_path / "cache"), ["env1"], roots=[str(sources)]
+        )
+        with BaitRegistry.scope():
+            baits = iter_baits([str(sources)], ["env1"], cache=cache)
+            names = [bait.name for bait, _ in baits]
+        cache.save()
+        return cache, names
+
+    import sys
+
+    sys.path.insert(0, str(sources))
+    try:
+        cache, names = run()
+        # helpers/names.py is cached as a file without generate()
+        assert (cache.hits, cache.misses, names) == (0, 2, ["cached"])
+        cache, names = run()
+        assert (cache.hits, cache.misses, names) == (2, 0, ["cached"])
+        (sources / "helpers" / "names.py").write_text("NAME = 'changed'\n")
+        sys.modules.pop("helpers.names")
+        cache, names = run()
+        assert (cache.hits, cache.misses, names) == (0, 2, ["changed"])
+    finally:
+        sys.path.remove(str(sources))
+        sys.modules.pop("helpers.names", None)
+        sys.modules.pop("helpers", None)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_compiling_baits_reports_failures(jobs):
+    from kfp import dsl
+    from data_baits.bait import BaitRegistry
+    from data_baits.baits import Pipeline
+    from data_baits.generate import compile_stream
+
+    @dsl.component(base_image="python:3.12")
+    def empty_component():
+        pass
+
+    @dsl.pipeline(name="compiled")
+    def empty_pipeline():
+        empty_component()
+
+    with BaitRegistry.scope():
+        compiled = Pipeline(
+            name="compiled", destinations=["env1"], kfp_pipeline=empty_pipeline
+        )
+        broken = Pipeline(name="broken", destinations=["env1", "env2"])
+        stream = [(compiled, ["env1"]), (broken, ["env1", "env2"])]
+        results = {
+            bait.name: (envs, error)
+            for bait, envs, error in compile_stream(stream, jobs=jobs)
+        }
+    assert results["compiled"] == (["env1"], None)
+    assert results["broken"][0] == ["env1", "env2"]
+    assert results["broken"][1] is not None
+    assert compiled.definition["pipelineInfo"]["name"] == "compiled"
+
+
+def test_dumping_only_changed_manifests(tmp_path):
+    from data_baits.bait import BaitRegistry
+    from data_baits.baits import MySQLInternalDatabase, SQLiteDatabase
+    from data_baits.generate import ManifestWriter
+
+    def dump(*baits):
+        writer = ManifestWriter(str(tmp_path / "output"))
+        for bait in baits:
+            writer.add(bait, ["env1"])
+        return writer.close()
+
+    output = tmp_path / "output"
+    output.mkdir()
+    with BaitRegistry.scope():
+        first = SQLiteDatabase(name="first", destinations=["env1"])
+        second = MySQLInternalDatabase(name="second", destinations=["env1"])
+        assert dump(first, second) == (7, 0)
+        job = (output / "env1" / "sniffer_job.yaml").read_text()
+        # unchanged sources keep the job, which is deleted once finished
+        assert "ttlSecondsAfterFinished: 3600" in job
+        assert dump(first, second) == (0, 7)
+        assert (output / "env1" / "sniffer_job.yaml").read_text() == job
+        second.storage = "2Gi"
+        # the bait, the secret and the job which reads it
+        assert dump(first, second) == (3, 4)
+    assert (output / "env1" / "sniffer_job.yaml").read_text() != job
+    assert sorted(os.listdir(tmp_path)) == ["output"]
+
+
+def test_dumping_manifests_serializes_baits_once(tmp_path, monkeypatch):
+    from data_baits.bait import BaitRegistry
+    from data_baits.baits import SQLiteDatabase
+    from data_baits.core.serialization import load_yaml
+    from data_baits.generate import ManifestWriter
+
+    dumped = []
+    dump_to_str = SQLiteDatabase.dump_to_str
+
+    def counting_dump_to_str(self, *args, **kwargs):
+        dumped.append(self.id())
+        return dump_to_str(self, *args, **kwargs)
+
+    monkeypatch.setattr(SQLiteDatabase, "dump_to_str", counting_dump_to_str)
+    with BaitRegistry.scope():
+        shared = SQLiteDatabase(
+            name="shared", destinations=["env1", "env2", "env3"]
+        )
+        writer = ManifestWriter(str(tmp_path), workers=3)
+        writer.add(shared, shared.destinations)
+        writer.close()
+    assert dumped == [shared.id()]
+    secrets = [
+        load_yaml((tmp_path / env / "sources_secret.yaml").read_text())
+        for env in shared.destinations
+    ]
+    assert secrets[0]["data"] == secrets[1]["data"] == secrets[2]["data"]
+
+
+def test_generating_manifests_releases_baits(tmp_path):
+    from data_baits.bait import BaitRegistry
+    from data_baits.generate import generate_manifests
+
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    write_generator(sources, "first.py", "first", ("env1", "env2"))
+    write_generator(sources, "second.py", "second", ("env2",))
+    with BaitRegistry.scope() as registry:
+        failed = generate_manifests(
+            [str(sources)], ["env1", "env2"], str(tmp_path / "output")
+        )
+        assert registry.all() == {}
+    assert failed == []
+    assert sorted(os.listdir(tmp_path / "output")) == ["env1", "env2"]
+    assert sorted(
+        file
+        for file in os.listdir(tmp_path / "output" / "env2")
+        if file.startswith("sqlitedatabase")
+    ) == [
+        "sqlitedatabase-first-0.1.0-github-cd.yaml",
+        "sqlitedatabase-second-0.1.0-github-cd.yaml",
+    ]
+
+
+def test_merging_sharded_outputs(tmp_path, monkeypatch):
+    from data_baits.bait import BaitRegistry
+    from data_baits.generate import generate_manifests, in_shard
+    from data_baits.merge import merge_outputs
+
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("sources")
+    for i in range(8):
+        write_generator("sources", f"gen_{i}.py", f"bait-{i}", ("e1", "e2"))
+    files = [os.path.join("sources", f"gen_{i}.py") for i in range(8)]
+    assignments = [
+        [index for index in range(3) if in_shard(file, index, 3)]
+        for file in files
+    ]
+    assert all(len(indices) == 1 for indices in assignments)
+
+    def generate(output, shard_index=0, shard_count=1):
+        with BaitRegistry.scope():
+            generate_manifests(
+                ["sources"],
+                ["e1", "e2"],
+                output,
+                shard_index=shard_index,
+                shard_count=shard_count,
+            )
+
+    generate("single")
+    for index in range(3):
+        generate(f"shard-{index}", index, 3)
+    shards = [f"shard-{index}" for index in range(3)]
+    assert merge_outputs(shards, "merged") == []
+    for env in ["e1", "e2"]:
+        assert sorted(os.listdir(os.path.join("merged", env))) == sorted(
+            os.listdir(os.path.join("single", env))
+        )
+        for file in os.listdir(os.path.join("single", env)):
+            with open(os.path.join("single", env, file)) as expected:
+                with open(os.path.join("merged", env, file)) as merged:
+                    assert merged.read() == expected.read()
+    errors = merge_outputs([*shards, "single"], "duplicated")
+    assert len(errors) == 8 * 2
+    assert "duplicate" in errors[0]
+    assert not [path for path in os.listdir() if "-staging-" in path]
+
+
+def test_watching_regenerates_affected_files(tmp_path, monkeypatch):
+    from data_baits.watch import GeneratorWatcher
+
+    sources = tmp_path / "sources"
+    (sources / "helpers").mkdir(parents=True)
+    (sources / "helpers" / "__init__.py").write_text("")
+    (sources / "helpers" / "names.py").write_text("NAME = 'helped'\n")
+    (sources / "helped.py").write_text(
+        "from helpers.names import NAME\n"
+        + GENERATOR.replace('"{name}"', "NAME").format(destinations=["env1"])
+    )
+    write_generator(sources, "plain.py", "plain", ("env1", "env2"))
+    (tmp_path / "output").mkdir()
+    monkeypatch.syspath_prepend(str(sources))
+    watcher = GeneratorWatcher(
+        [str(sources)], ["env1", "env2"], str(tmp_path / "output")
+    )
+
+    def manifests(env):
+        return sorted(
+            file
+            for file in os.listdir(tmp_path / "output" / env)
+            if file.startswith("sqlitedatabase")
+        )
+
+    try:
+        # helpers/names.py is run too, as a file without generate()
+        assert watcher.update(watcher.scan()) == 3
+        assert manifests("env1") == [
+            "sqlitedatabase-helped-0.1.0-github-cd.yaml",
+            "sqlitedatabase-plain-0.1.0-github-cd.yaml",
+        ]
+        assert watcher.scan() == set()
+        plain = tmp_path / "output" / "env2" / manifests("env2")[0]
+        modified = plain.stat().st_mtime_ns
+
+        (sources / "helpers" / "names.py").write_text("NAME = 'renamed'\n")
+        changed = watcher.scan()
+        assert changed == {str(sources / "helpers" / "names.py")}
+        # the helper module and the generator importing it
+        assert watcher.update(changed) == 2
+        assert manifests("env1") == [
+            "sqlitedatabase-plain-0.1.0-github-cd.yaml",
+            "sqlitedatabase-renamed-0.1.0-github-cd.yaml",
+        ]
+        assert plain.stat().st_mtime_ns == modified
+
+        write_generator(sources, "plain.py", "plain", ("env1",))
+        assert watcher.update(watcher.scan()) == 1
+        assert manifests("env2") == []
+        (sources / "plain.py").unlink()
+        assert watcher.update(watcher.scan()) == 0
+        assert manifests("env1") == [
+            "sqlitedatabase-renamed-0.1.0-github-cd.yaml",
+        ]
+    finally:
+        sys.modules.pop("helpers.names", None)
+        sys.modules.pop("helpers", None)
+
+
+def test_generator_cache_is_opt_in(tmp_path, monkeypatch):
+    from click.testing import CliRunner
+    from data_baits.generate import generate
+
+    sources = tmp_path / "sources"
+    output = tmp_path / "output"
+    sources.mkdir()
+    output.mkdir()
+    write_generator(
+        sources,
+        "generator.py",
+        None,
+        body=(
+            "import os\n"
+            + GENERATOR.replace('"{name}"', 'os.environ["BAIT_NAME"]')
+        ).format(destinations=["env1"]),
+    )
+    monkeypatch.chdir(tmp_path)
+
+    def run(name, *options):
+        monkeypatch.setenv("BAIT_NAME", name)
+        result = CliRunner().invoke(
+            generate,
+            [
+                "--input_paths",
+                str(sources),
+                "--output_path",
+                str(output),
+                "--destinations",
+                "env1",
+                *options,
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        return "".join(os.listdir(output / "env1"))
+
+    assert "-first-" in run("first")
+    assert "-second-" in run("second")
+    assert "-second-" in run("second", "--cache")
+    # the environment variable is not a part of the cache key
+    assert "-third-" not in run("third", "--cache")
+
+
+def test_sniffer_job_gets_the_signing_key(tmp_path, monkeypatch):
+    from data_baits.bait import BaitRegistry
+    from data_baits.baits import SQLiteDatabase
+    from data_baits.core.serialization import load_yaml
+    from data_baits.core.settings import settings
+    from data_baits.generate import ManifestWriter
+    from data_baits.sources import decode_secrets, manifest_signature
+
+    monkeypatch.setattr(settings, "SOURCES_SIGNING_KEY", "secret")
+    with BaitRegistry.scope():
+        writer = ManifestWriter(str(tmp_path))
+        writer.add(SQLiteDatabase(name="signed", destinations=["a"]), ["a"])
+        writer.close()
+    job = load_yaml((tmp_path / "a" / "sniffer_job.yaml").read_text())
+    container = job["spec"]["template"]["spec"]["containers"][0]
+    assert "--trusted" in container["command"]
+    assert {
+        "name": "DATA_BAITS_SOURCES_SIGNING_KEY",
+        "valueFrom": {
+            "secretKeyRef": {
+                "name": "data-baits-signing-key",
+                "key": "key",
+                "optional": True,
+            }
+        },
+    } in container["env"]
+    secret = load_yaml((tmp_path / "a" / "sources_secret.yaml").read_text())
+    [(_, manifest, _, signature)] = decode_secrets(
+        [("secret", secret["data"])]
+    )
+    assert signature == manifest_signature(manifest, "secret")
@@ -0,0 +1,153 @@
+import pytest
+
+
+def test_loading_manifests_dispatches_on_type():
+    from data_baits.bait import Bait
+    from data_baits.baits import MySQLInternalDatabase, Trap
+
+    trap = Trap(
+        name="manifest-trap",
+        bait="manifest-bait",
+        experiment="manifest-experiment",
+        destinations=["env1"],
+    )
+    database = MySQLInternalDatabase(
+        name="manifest-database",
+        destinations=["env1"],
+    )
+    for bait in [trap, database]:
+        content = bait.dump_to_yaml_str().replace("manifest-", "loaded-")
+        loaded = Bait.yaml_str_to_bait(content)
+        assert type(loaded) is type(bait)
+        assert loaded.name == bait.name.replace("manifest-", "loaded-")
+    untyped = Bait.yaml_str_to_bait("name: untyped\ndestinations: [a]")
+    assert type(untyped) is Bait
+    with pytest.raises(ValueError, match="Unknown bait type"):
+        Bait.yaml_str_to_bait("name: x\ntype: NotABait\ndestinations: [a]")
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_loading_many_manifests_collects_errors(use_processes):
+    from data_baits.bait import Bait, BaitRegistry
+
+    prefix = f"many-{int(use_processes)}"
+    sources = [
+        (f"{prefix}-{i}", f"name: {prefix}-{i}\ndestinations: [env1]")
+        for i in range(5)
+    ]
+    sources.insert(2, ("broken", "name: broken\ndestinations: []"))
+    errors = {}
+    baits = Bait.load_many(
+        iter(sources),
+        errors=errors,
+        max_workers=2,
+        use_processes=use_processes,
+    )
+    assert [bait.name for bait in baits] == [f"{prefix}-{i}" for i in range(5)]
+    assert list(errors) == ["broken"]
+    assert BaitRegistry().get(f"{prefix}-4") is not None
+
+
+def test_trusted_manifests_need_a_valid_signature(monkeypatch):
+    from packaging.version import InvalidVersion, Version
+    from data_baits.bait import Bait
+    from data_baits.core.settings import settings
+    from data_baits.sources import (
+        decode_sources,
+        encode_sources,
+        manifest_checksum,
+        manifest_signature,
+    )
+
+    content = "name: Trusted Name\ndestinations: [Env 1]\nversion: '1.0'\n"
+    # a checksum can be computed by anyone, so it is not trusted
+    checked = Bait.yaml_str_to_bait(content, manifest_checksum(content))
+    assert checked.name == "trusted-name"
+    monkeypatch.setattr(settings, "SOURCES_SIGNING_KEY", "secret")
+    # what is rejected without a signature is rejected with it too
+    unquoted = content.replace("'1.0'", "2")
+    for signature in [None, manifest_signature(unquoted, "secret")]:
+        with pytest.raises(ValueError):
+            Bait.yaml_str_to_bait(unquoted, signature)
+    signed = content.replace("1.0", "2.0")
+    trusted = Bait.yaml_str_to_bait(
+        signed, manifest_signature(signed, "secret")
+    )
+    # the fields of the id and of the version comparison are validated
+    assert trusted.name == "trusted-name"
+    assert trusted.destinations == ["env-1"]
+    assert trusted.version == Version("2.0")
+    assert Bait.get("trusted-name") is trusted
+    broken = content.replace("1.0", "not a version")
+    with pytest.raises(InvalidVersion):
+        Bait.yaml_str_to_bait(broken, manifest_signature(broken, "secret"))
+
+    data = encode_sources({"bait.yaml": content}, signing_key="secret")
+    assert list(decode_sources("secret", data)) == [
+        (
+            "secret/bait.yaml",
+            content,
+            manifest_checksum(content),
+            manifest_signature(content, "secret"),
+        )
+    ]
+
+
+@pytest.mark.parametrize(
+    "manifest_format,backend",
+    [("yaml", "ruamel"), ("yaml", "libyaml"), ("json", "ruamel")],
+)
+def test_manifest_backends_round_trip(manifest_format, backend):
+    from data_baits.bait import Bait
+    from data_baits.baits import SQLiteDatabase
+    from data_baits.core.serialization import dump_manifest, load_manifest
+
+    name = f"backend-{manifest_format}-{backend}"
+    database = SQLiteDatabase(name=name, destinations=["env1"])
+    content = dump_manifest(database, manifest_format, backend)
+    assert load_manifest(content, backend) == database.model_dump(mode="json")
+    database.version = "0.2.0"
+    loaded = Bait.yaml_str_to_bait(content)
+    assert type(loaded) is SQLiteDatabase
+    assert loaded.id() == database.id().replace("0.2.0", "0.1.0")
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_sharded_sources_are_reassembled(compression):
+    import random
+    from data_baits.sources import (
+        decode_secrets,
+        encode_source,
+        manifest_checksum,
+        shard_sources,
+    )
+
+    randomness = random.Random(0)
+    manifests = {
+        f"bait-{i}.yaml": "".join(
+            randomness.choice("abcdef\n") for _ in range(5000)
+        )
+        for i in range(5)
+    }
+    data = {}
+    for name, manifest in manifests.items():
+        data.update(
+            encode_source(
+                name, manifest, compression=compression, max_entry_bytes=2000
+            )
+        )
+    assert any(".part-" in name for name in data)
+    shards = shard_sources(data, max_bytes=4000)
+    assert len(shards) > 1
+    assert all(
+        sum(len(k) + len(v) for k, v in shard.items()) <= 4000
+        for shard in shards
+    )
+    secrets = [(f"secret-{i}", shard) for i, shard in enumerate(shards)]
+    decoded = list(decode_secrets(reversed(secrets)))
+    assert {label.split("/")[1]: m for label, m, _, _ in decoded} == manifests
+    assert all(c == manifest_checksum(m) for _, m, c, _ in decoded)
+    part = next(name for name in data if ".part-" in name)
+    del data[part]
+    with pytest.raises(ValueError, match="incomplete"):
+        list(decode_secrets([("secret", data)]))
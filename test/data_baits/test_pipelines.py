@@ -111,3 +111,125 @@ def test_writing_core_pipelines_to_yaml(
     else:
         with pytest.raises(Exception):
             run()
+
+
+def test_compile_cache(tmp_path):
+    from data_baits.bait import BaitRegistry
+    from data_baits.baits import Pipeline
+    from data_baits.cache import CompileCache
+
+    cache = CompileCache(str(tmp_path), max_bytes=10**9)
+    with BaitRegistry.scope():
+        first = Pipeline(
+            name="cached",
+            destinations=["env1"],
+            kfp_pipeline=multi_component_pipeline,
+        )
+        first.compile(cache=cache)
+        assert (cache.hits, cache.misses) == (0, 1)
+        second = Pipeline(
+            name="cached",
+            version="0.2.0",
+            destinations=["env1"],
+            kfp_pipeline=multi_component_pipeline,
+        )
+        second.compile(cache=cache)
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert second.definition == first.definition
+        renamed = Pipeline(
+            name="renamed",
+            destinations=["env1"],
+            kfp_pipeline=multi_component_pipeline,
+        )
+        renamed.compile(cache=cache)
+        assert (cache.hits, cache.misses) == (1, 2)
+        assert renamed.definition["pipelineInfo"]["name"] == "renamed"
+    assert len(os.listdir(tmp_path)) == 2
+    cache.max_bytes = 1
+    cache.evict()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("internals", [True, False])
+def test_compiling_and_uploading_a_shared_package(monkeypatch, internals):
+    from types import SimpleNamespace
+    from kfp import compiler
+    from data_baits.bait import BaitRegistry
+    from data_baits.baits import Pipeline
+    from data_baits.core.serialization import load_yaml
+
+    from data_baits.baits import pipeline as pipeline_module
+
+    if not internals:
+        # the kfp internals moved, the public compiler is used instead
+        monkeypatch.setattr(pipeline_module, "pipeline_spec_builder", None)
+    calls = []
+    paths = []
+
+    def upload(method):
+        def call(pipeline_package_path, **kwargs):
+            with open(pipeline_package_path, "rb") as f:
+                calls.append((method, kwargs, f.read()))
+            paths.append(pipeline_package_path)
+            return SimpleNamespace(pipeline_id="some-id")
+
+        return call
+
+    client = SimpleNamespace(
+        upload_pipeline=upload("upload_pipeline"),
+        upload_pipeline_version=upload("upload_pipeline_version"),
+    )
+    inputs = {"a": 1.0, "b": 2.0, "c": 3.0}
+    with BaitRegistry.scope():
+        pipeline = Pipeline(
+            name="in-memory",
+            destinations=["env1"],
+            parameters=inputs,
+            kfp_pipeline=pipeline_with_inputs,
+        )
+        pipeline.compile()
+        # both uploads of a new pipeline share one package file
+        with pipeline.package_file() as package_path:
+            assert pipeline.deploy(
+                client, use_version=False, package_path=package_path
+            )
+            assert pipeline.deploy(
+                client, use_version=True, package_path=package_path
+            )
+        assert pipeline.deploy(client, use_version=True)
+    with tempfile.NamedTemporaryFile(suffix=".yaml") as f:
+        compiler.Compiler().compile(
+            pipeline_func=pipeline_with_inputs,
+            package_path=f.name,
+            pipeline_name="in-memory",
+            pipeline_parameters=inputs,
+        )
+        assert pipeline.definition == load_yaml(f.read().decode("utf-8"))
+    assert [(method, kwargs) for method, kwargs, _ in calls] == [
+        (
+            "upload_pipeline",
+            {"pipeline_name": "in-memory", "description": None},
+        ),
+        (
+            "upload_pipeline_version",
+            {
+                "pipeline_version_name": "0.1.0",
+                "pipeline_id": None,
+                "pipeline_name": "in-memory",
+                "description": None,
+            },
+        ),
+        (
+            "upload_pipeline_version",
+            {
+                "pipeline_version_name": "0.1.0",
+                "pipeline_id": None,
+                "pipeline_name": "in-memory",
+                "description": None,
+            },
+        ),
+    ]
+    assert paths[0] == paths[1] != paths[2]
+    assert not any(os.path.exists(path) for path in paths)
+    assert calls[0][2] == calls[1][2] == calls[2][2] == pipeline.package()
+    assert load_yaml(calls[0][2].decode("utf-8")) == pipeline.definition
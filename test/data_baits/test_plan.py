@@ -0,0 +1,96 @@
+import json
+import pytest
+from packaging.version import Version
+
+
+def write_manifests(path, versions):
+    from data_baits.bait import Bait, BaitRegistry
+
+    with BaitRegistry.scope():
+        for name, version in versions:
+            bait = Bait(name=name, version=version, destinations=["env1"])
+            bait.dump_to_yaml(str(path / f"{bait.id()}.yaml"))
+
+
+def test_planning_against_registry_snapshot(tmp_path):
+    from data_baits.plan import load_snapshot, make_plan
+
+    write_manifests(
+        tmp_path,
+        [
+            ("planned-new", "0.1.0"),
+            ("planned-newer", "0.3.0"),
+            ("planned-newer", "0.2.0"),
+            ("planned-same", "1.0.0"),
+            ("planned-older", "0.1.0"),
+        ],
+    )
+    snapshot = tmp_path / "registry.json"
+    snapshot.write_text(
+        json.dumps(
+            {
+                "kind": "ConfigMap",
+                "data": {
+                    "first_deployment": "2024-01-01 00:00:00",
+                    "bait-planned-newer_0.1.0": "2024-01-01 00:00:00",
+                    "bait-planned-same_1.0.0": "2024-01-01 00:00:00",
+                    "bait-planned-older_0.2.0": "2024-01-01 00:00:00",
+                },
+            }
+        )
+    )
+    registry_data = load_snapshot(str(snapshot))
+    sources = []
+    for file in sorted(tmp_path.glob("bait-*.yaml")):
+        sources.append((str(file), file.read_text()))
+    plan = make_plan(sources, registry_data)
+    assert [bait["id"] for bait in plan["baits"]] == [
+        "bait-planned-new-0.1.0",
+        "bait-planned-newer-0.2.0",
+        "bait-planned-newer-0.3.0",
+    ]
+    assert plan["registry"]["bait-planned-older"] == "0.2.0"
+    rollback_plan = make_plan(sources, registry_data, rollback=True)
+    assert [bait["id"] for bait in rollback_plan["baits"]] == [
+        "bait-planned-same-1.0.0",
+    ]
+
+
+def test_checking_plan_against_changed_registry():
+    from data_baits.plan import check_plan, make_plan
+
+    plan = make_plan([], {"bait-checked_0.1.0": "2024-01-01 00:00:00"})
+    check_plan(plan, {"bait-checked": Version("0.1.0")})
+    with pytest.raises(ValueError, match="bait-checked"):
+        check_plan(plan, {"bait-checked": Version("0.2.0")})
+    with pytest.raises(ValueError, match="format"):
+        check_plan({**plan, "format": 0}, {"bait-checked": Version("0.1.0")})
+
+
+def test_planning_databases_in_generated_output(tmp_path):
+    from data_baits.bait import BaitRegistry
+    from data_baits.baits import MySQLInternalDatabase, SQLiteDatabase
+    from data_baits.generate import generate_manifests
+    from data_baits.plan import _read_manifests, make_plan
+
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    (sources / "databases.py").write_text(
+        "from data_baits.baits import MySQLInternalDatabase, SQLiteDatabase"
+        "\n\n\ndef generate():\n    return [\n"
+        "        MySQLInternalDatabase(name='planned', destinations=['env1']),"
+        "\n        SQLiteDatabase(name='planned', destinations=['env1']),\n"
+        "    ]\n"
+    )
+    (tmp_path / "output").mkdir()
+    with BaitRegistry.scope():
+        generate_manifests([str(sources)], ["env1"], str(tmp_path / "output"))
+        mysql = MySQLInternalDatabase(name="planned", destinations=["env1"])
+        sqlite = SQLiteDatabase(name="planned", destinations=["env1"])
+    # the kustomization, namespaces and sources secrets are skipped
+    manifests = list(_read_manifests(str(tmp_path / "output")))
+    registry_data = {f"{mysql.id(use_version=False)}_0.1.0": "2024-01-01"}
+    plan = make_plan(manifests, registry_data)
+    assert [bait["id"] for bait in plan["baits"]] == [sqlite.id()]
+    rollback_plan = make_plan(manifests, registry_data, rollback=True)
+    assert [bait["id"] for bait in rollback_plan["baits"]] == [mysql.id()]
@@ -0,0 +1,140 @@
+from packaging.version import Version
+
+
+def test_registry_latest_and_exact_lookup():
+    from data_baits.bait import Bait, BaitRegistry
+
+    for version in ["0.2.0", "0.10.0", "0.9.1"]:
+        Bait(name="registry-lookup", version=version, destinations=["env1"])
+    registry = BaitRegistry()
+    assert registry.get("registry-lookup").version == Version("0.10.0")
+    assert registry.get("registry-lookup", "0.9.1").version == Version("0.9.1")
+    assert registry.get("registry-lookup", "1.0.0") is None
+    assert registry.get("registry-missing") is None
+    assert registry.versions("registry-lookup") == [
+        Version("0.2.0"),
+        Version("0.9.1"),
+        Version("0.10.0"),
+    ]
+
+
+def test_registry_range_lookup():
+    from data_baits.bait import Bait, BaitRegistry
+
+    for version in ["1.0.0", "1.5.0", "2.0.0", "2.1.0"]:
+        Bait(name="registry-range", version=version, destinations=["env1"])
+    baits = BaitRegistry().get_range("registry-range", "1.5", "2.1")
+    assert [str(bait.version) for bait in baits] == ["1.5.0", "2.0.0"]
+
+
+def test_registry_follows_version_changes():
+    from data_baits.bait import Bait, BaitRegistry
+
+    bait = Bait(name="registry-moving", destinations=["env1"])
+    bait.version = "3.0.0"
+    registry = BaitRegistry()
+    assert registry.get("registry-moving", "0.1.0") is None
+    assert registry.get("registry-moving") is bait
+    assert bait.id() in registry.all()
+
+
+def test_cached_version_keys_order_as_versions():
+    import random
+    from data_baits.bait import Bait, BaitRegistry
+
+    versions = [
+        "1.0.0.dev1",
+        "1.0.0a1",
+        "1.0.0a2",
+        "1.0.0b1",
+        "1.0.0rc1",
+        "1.0.0",
+        "1.0.0.post1",
+        "1.0.1",
+        "1.10.0",
+        "2.0.0rc1",
+    ]
+    shuffled = list(versions)
+    random.Random(0).shuffle(shuffled)
+    with BaitRegistry.scope() as registry:
+        baits = [
+            Bait(name="registry-keys", version=version, destinations=["a"])
+            for version in shuffled
+        ]
+        assert registry.versions("registry-keys") == sorted(
+            Version(version) for version in versions
+        )
+        assert [bait.version_key for bait in baits] == [
+            Version(version) for version in shuffled
+        ]
+        assert registry.get("registry-keys").version == Version("2.0.0rc1")
+        # a changed version invalidates the cached key and the index
+        latest = registry.get("registry-keys")
+        latest.version = "0.1.0rc1"
+        assert latest.version_key == Version("0.1.0rc1")
+        assert registry.versions("registry-keys")[0] == Version("0.1.0rc1")
+        assert registry.get("registry-keys").version == Version("1.10.0")
+        # adding it again does not duplicate it in the index
+        registry.set(latest)
+        assert (
+            registry.versions("registry-keys").count(Version("0.1.0rc1")) == 1
+        )
+        # a copy does not reuse the cached key of the original
+        copied = latest.model_copy(update={"version": "3.0.0a1"})
+        assert copied.version_key == Version("3.0.0a1")
+        assert latest.version_key == Version("0.1.0rc1")
+
+
+def test_scoped_registries_are_isolated_and_released():
+    import gc
+    import weakref
+    from data_baits.bait import Bait, BaitRegistry
+
+    default = BaitRegistry()
+    with BaitRegistry.scope() as scoped:
+        assert BaitRegistry() is scoped
+        bait = Bait(name="registry-scoped", destinations=["env1"])
+        assert scoped.get("registry-scoped") is bait
+    assert BaitRegistry() is default
+    assert default.get("registry-scoped") is None
+    # the same ids can be loaded again in another scope
+    with BaitRegistry.scope() as reloaded:
+        Bait(name="registry-scoped", destinations=["env1"])
+    released = weakref.ref(scoped)
+    del scoped, bait
+    gc.collect()
+    assert released() is None
+    assert len(reloaded.all()) == 1
+
+
+def test_swapping_the_process_registry():
+    from data_baits.bait import Bait, BaitRegistry
+
+    with BaitRegistry.scope() as new_registry:
+        Bait(name="registry-swapped", destinations=["env1"])
+    previous = BaitRegistry.swap(new_registry)
+    try:
+        assert BaitRegistry().get("registry-swapped") is not None
+    finally:
+        BaitRegistry.swap(previous)
+    assert BaitRegistry().get("registry-swapped") is None
+
+
+def test_changing_a_bait_reindexes_its_own_registry():
+    import pickle
+    from data_baits.bait import Bait, BaitRegistry
+
+    with BaitRegistry.scope() as owner:
+        bait = Bait(name="registry-owned", destinations=["env1"])
+    with BaitRegistry.scope() as current:
+        Bait(name="registry-owned", destinations=["env1"])
+        bait.version = "1.0.0"
+        bait.name = "registry-renamed"
+        assert current.versions("registry-owned") == [Version("0.1.0")]
+        assert current.get("registry-renamed") is None
+    assert owner.get("registry-owned") is None
+    assert owner.get("registry-renamed", "1.0.0") is bait
+    # an unpickled bait is owned by the registry it is added to
+    unpickled = pickle.loads(pickle.dumps(bait))
+    unpickled.version = "2.0.0"
+    assert owner.versions("registry-renamed") == [Version("1.0.0")]
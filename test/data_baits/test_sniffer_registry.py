@@ -0,0 +1,138 @@
+import copy
+from types import SimpleNamespace
+from kubernetes.client.exceptions import ApiException
+from packaging.version import Version
+
+
+class FakeCoreV1Api:
+    """Stores ConfigMaps, rejecting patches of stale resourceVersions."""
+
+    def __init__(self):
+        self.config_maps = {}
+        self.versions = 0
+        self.patches = []
+
+    def _stored(self, name, data, labels):
+        self.versions += 1
+        self.config_maps[name] = SimpleNamespace(
+            metadata=SimpleNamespace(
+                name=name,
+                labels=labels,
+                resource_version=str(self.versions),
+            ),
+            data=data,
+        )
+        return copy.deepcopy(self.config_maps[name])
+
+    def read_namespaced_config_map(self, name, namespace):
+        if name not in self.config_maps:
+            raise ApiException(status=404)
+        return copy.deepcopy(self.config_maps[name])
+
+    def list_namespaced_config_map(self, namespace, label_selector):
+        return SimpleNamespace(
+            items=[
+                copy.deepcopy(config_map)
+                for config_map in self.config_maps.values()
+                if label_selector in (config_map.metadata.labels or {})
+            ]
+        )
+
+    def create_namespaced_config_map(self, namespace, body):
+        metadata = body["metadata"]
+        if metadata["name"] in self.config_maps:
+            raise ApiException(status=409)
+        return self._stored(
+            metadata["name"], dict(body["data"]), metadata.get("labels")
+        )
+
+    def patch_namespaced_config_map(self, name, namespace, body):
+        stored = self.config_maps[name]
+        metadata = body.get("metadata", {})
+        resource_version = metadata.get("resourceVersion")
+        if resource_version not in (None, stored.metadata.resource_version):
+            raise ApiException(status=409)
+        self.patches.append((name, body.get("data")))
+        data = dict(stored.data or {})
+        for key, value in (body.get("data") or {}).items():
+            if value is None:
+                data.pop(key, None)
+            else:
+                data[key] = value
+        labels = {
+            **(stored.metadata.labels or {}),
+            **metadata.get("labels", {}),
+        }
+        return self._stored(name, data, labels)
+
+
+def test_registry_patches_entries_in_shards():
+    from data_baits.sniffer_registry import SnifferRegistry
+
+    v1 = FakeCoreV1Api()
+    v1._stored(
+        "sniffer-registry",
+        {
+            "first_deployment": "2024-01-01T00:00:00",
+            "bait-legacy_0.1.0": "2024-01-01T00:00:00",
+            "bait-legacy_0.2.0": "2024-01-01T00:00:00",
+        },
+        None,
+    )
+    registry = SnifferRegistry(v1, max_bytes=150).load()
+    assert registry.first_deployment == "2024-01-01T00:00:00"
+    assert registry.latest("bait-legacy") == Version("0.2.0")
+    for i in range(6):
+        registry.add(f"bait-sharded-{i}", Version("1.0.0"))
+    assert sorted(v1.config_maps) == [
+        "sniffer-registry",
+        "sniffer-registry-1",
+        "sniffer-registry-2",
+    ]
+    # every write patches a single entry
+    assert all(len(data) == 1 for _, data in v1.patches if data)
+    registry.remove("bait-legacy", Version("0.2.0"))
+    assert registry.latest("bait-legacy") == Version("0.1.0")
+
+    reloaded = SnifferRegistry(v1, max_bytes=150).load()
+    assert reloaded.entries() == registry.entries()
+    assert reloaded.deployed() == {
+        "bait-legacy": Version("0.1.0"),
+        **{f"bait-sharded-{i}": Version("1.0.0") for i in range(6)},
+    }
+
+
+def test_registry_retries_conflicting_updates():
+    from data_baits.sniffer_registry import SnifferRegistry
+
+    v1 = FakeCoreV1Api()
+    first = SnifferRegistry(v1).load()
+    second = SnifferRegistry(v1).load()
+    first.add("bait-first", Version("0.1.0"))
+    # second has a stale resourceVersion, re-reads and keeps both entries
+    second.add("bait-second", Version("0.1.0"))
+    assert SnifferRegistry(v1).load().deployed() == {
+        "bait-first": Version("0.1.0"),
+        "bait-second": Version("0.1.0"),
+    }
+
+
+def test_registry_created_concurrently_is_read():
+    from data_baits.sniffer_registry import SnifferRegistry
+
+    v1 = FakeCoreV1Api()
+    other = FakeCoreV1Api()
+    other.config_maps = v1.config_maps
+    read = v1.read_namespaced_config_map
+
+    def read_before_the_other_sniffer(name, namespace):
+        if name not in v1.config_maps:
+            # the other sniffer creates the registry after this read
+            SnifferRegistry(other).load().add("bait-other", Version("0.1.0"))
+            raise ApiException(status=404)
+        return read(name, namespace)
+
+    v1.read_namespaced_config_map = read_before_the_other_sniffer
+    registry = SnifferRegistry(v1).load()
+    assert registry.first_deployment is not None
+    assert registry.deployed() == {"bait-other": Version("0.1.0")}
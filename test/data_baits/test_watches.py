@@ -0,0 +1,267 @@
+from types import SimpleNamespace
+import threading
+import time
+import pytest
+from kubernetes.client.exceptions import ApiException
+
+
+def item(name):
+    return SimpleNamespace(metadata=SimpleNamespace(name=name))
+
+
+class FakeWatch:
+    """Streams the next batch of events, or raises it if an exception."""
+
+    batches = []
+
+    def stream(self, list_call, resource_version, timeout_seconds, **kwargs):
+        batch = self.batches.pop(0)
+        if isinstance(batch, Exception):
+            raise batch
+        yield from batch
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def fake_watch(monkeypatch):
+    from data_baits.core import watches
+
+    monkeypatch.setattr(watches.watch, "Watch", FakeWatch)
+    return FakeWatch
+
+
+def make_list_call(*listings):
+    calls = []
+    listings = list(listings)
+
+    def list_call(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(
+            items=listings.pop(0),
+            metadata=SimpleNamespace(resource_version=str(len(calls))),
+        )
+
+    return list_call, calls
+
+
+def test_waiting_for_deletion_with_watch(fake_watch):
+    from data_baits.core.watches import wait_for_deletion
+
+    list_call, calls = make_list_call([item("db")], [item("db")])
+    fake_watch.batches = [
+        # the resource version is too old, so it is listed again
+        ApiException(status=410),
+        [
+            {"type": "MODIFIED", "object": item("db")},
+            {"type": "DELETED", "object": item("db")},
+        ],
+    ]
+    assert wait_for_deletion(list_call, "db", 10, namespace="ns")
+    assert (
+        calls
+        == [
+            {"field_selector": "metadata.name=db", "namespace": "ns"},
+        ]
+        * 2
+    )
+    assert fake_watch.batches == []
+
+
+def test_waiting_for_deletion_times_out(fake_watch):
+    from data_baits.core.watches import wait_for_deletion
+
+    def slow_events():
+        time.sleep(0.02)
+        yield {"type": "MODIFIED", "object": item("db")}
+
+    list_call, _ = make_list_call([item("db")])
+    fake_watch.batches = [slow_events()]
+    assert not wait_for_deletion(list_call, "db", 0.01)
+    list_call, _ = make_list_call([])
+    assert wait_for_deletion(list_call, "db", 0)
+
+
+def test_waiting_for_ready_database(fake_watch, monkeypatch):
+    from kubernetes import client
+    from data_baits.bait import BaitRegistry
+    from data_baits.baits import MySQLInternalDatabase
+
+    def deployment(available_replicas):
+        return SimpleNamespace(
+            metadata=SimpleNamespace(name="db"),
+            status=SimpleNamespace(available_replicas=available_replicas),
+        )
+
+    def pod(ready):
+        return SimpleNamespace(
+            metadata=SimpleNamespace(name="db-pod", deletion_timestamp=None),
+            status=SimpleNamespace(
+                conditions=[SimpleNamespace(type="Ready", status=ready)]
+            ),
+        )
+
+    list_deployments, deployment_calls = make_list_call([deployment(0)])
+    list_pods, pod_calls = make_list_call([pod("False")])
+    monkeypatch.setattr(
+        client,
+        "AppsV1Api",
+        lambda: SimpleNamespace(list_namespaced_deployment=list_deployments),
+    )
+    monkeypatch.setattr(
+        client,
+        "CoreV1Api",
+        lambda: SimpleNamespace(list_namespaced_pod=list_pods),
+    )
+    fake_watch.batches = [
+        [
+            {"type": "MODIFIED", "object": deployment(None)},
+            {"type": "MODIFIED", "object": deployment(1)},
+        ],
+        [{"type": "MODIFIED", "object": pod("True")}],
+    ]
+    with BaitRegistry.scope():
+        database = MySQLInternalDatabase(
+            name="ready", destinations=["env1"], namespace="ns"
+        )
+        assert database.wait_ready(10)
+    name = database.database_name()
+    assert deployment_calls == [
+        {"namespace": "ns", "field_selector": f"metadata.name={name}"}
+    ]
+    assert pod_calls == [{"namespace": "ns", "label_selector": f"app={name}"}]
+    assert fake_watch.batches == []
+
+
+class FakeClusterApi:
+    """Deletes the database resources, listing the ones not deleted yet.
+
+    The deletes wait for each other, so that they must run concurrently.
+    """
+
+    def __init__(self, missing=(), stuck=()):
+        self.missing = set(missing)
+        self.stuck = set(stuck)
+        self.deleted = []
+        self.listed = []
+        self.barrier = threading.Barrier(4, timeout=5)
+
+    def read_namespaced_secret(self, name, namespace):
+        return SimpleNamespace(
+            metadata=SimpleNamespace(labels={"autogenerated": "true"})
+        )
+
+    def delete_namespaced_secret(self, name, namespace):
+        self.deleted.append(("secret", name, namespace))
+
+    def _delete(self, resource, name, body, namespace=None):
+        self.barrier.wait()
+        assert body.propagation_policy == "Foreground"
+        if resource in self.missing:
+            error = ApiException(status=404, reason="NotFound")
+            # the reason is read from the body of the API errors
+            error.body = '{"reason": "NotFound"}'
+            raise error
+        self.deleted.append((resource, name, namespace))
+
+    def _list(self, resource, field_selector, namespace=None):
+        self.listed.append((resource, field_selector, namespace))
+        name = field_selector.split("=", 1)[1]
+        return SimpleNamespace(
+            items=[item(name)] if resource in self.stuck else [],
+            metadata=SimpleNamespace(resource_version="1"),
+        )
+
+    def __getattr__(self, method):
+        # e.g. delete_namespaced_service or list_persistent_volume
+        action, _, resource = method.partition("_")
+        resource = resource.replace("namespaced_", "")
+        if action == "delete":
+            return lambda **kwargs: self._delete(resource, **kwargs)
+        if action == "list":
+            return lambda **kwargs: self._list(resource, **kwargs)
+        raise AttributeError(method)
+
+
+@pytest.mark.parametrize(
+    "missing,stuck,passed",
+    [
+        ((), (), True),
+        # a missing resource may still be terminating, so it is waited for
+        (("deployment",), (), True),
+        (("deployment",), ("deployment",), False),
+        ((), ("persistent_volume",), False),
+    ],
+)
+def test_rolling_back_database(monkeypatch, missing, stuck, passed):
+    from kubernetes import client
+    from data_baits.baits import MySQLInternalDatabase
+
+    api = FakeClusterApi(missing, stuck)
+    monkeypatch.setattr(client, "CoreV1Api", lambda: api)
+    monkeypatch.setattr(client, "AppsV1Api", lambda: api)
+    assert MySQLInternalDatabase.rollback("db", "ns", timeout=0) is passed
+    resources = {
+        "service": "ns",
+        "deployment": "ns",
+        "persistent_volume_claim": "ns",
+        "persistent_volume": None,
+    }
+    assert sorted(api.deleted) == sorted(
+        [("secret", "db", "ns")]
+        + [
+            (resource, "db", namespace)
+            for resource, namespace in resources.items()
+            if resource not in missing
+        ]
+    )
+    # every resource is waited for, even the ones not found
+    assert sorted(api.listed) == sorted(
+        (resource, "metadata.name=db", namespace)
+        for resource, namespace in resources.items()
+    )
+
+
+def test_waiting_for_ready_database_shares_the_timeout(monkeypatch):
+    from kubernetes import client
+    from data_baits.bait import BaitRegistry
+    from data_baits.baits import MySQLInternalDatabase
+    from data_baits.baits import database as database_module
+
+    waits = []
+    results = []
+
+    def wait_for(list_call, condition, timeout, **kwargs):
+        waits.append((list_call, timeout))
+        time.sleep(0.05)
+        return results.pop(0)
+
+    monkeypatch.setattr(database_module, "wait_for", wait_for)
+    monkeypatch.setattr(
+        client,
+        "AppsV1Api",
+        lambda: SimpleNamespace(list_namespaced_deployment="deployments"),
+    )
+    monkeypatch.setattr(
+        client,
+        "CoreV1Api",
+        lambda: SimpleNamespace(list_namespaced_pod="pods"),
+    )
+    with BaitRegistry.scope():
+        database = MySQLInternalDatabase(name="ready", destinations=["env1"])
+        results[:] = [True, True]
+        assert database.wait_ready(1)
+        # the pods get what is left after waiting for the deployment
+        assert [list_call for list_call, _ in waits] == ["deployments", "pods"]
+        assert waits[0][1] == 1
+        assert 0 < waits[1][1] <= 0.95
+        waits.clear()
+        results[:] = [True, False]
+        assert not database.wait_ready(0.01)
+        assert waits == [("deployments", 0.01), ("pods", 0.0)]
+        waits.clear()
+        # the pods are not waited for without an available deployment
+        results[:] = [False]
+        assert not database.wait_ready(1)
+        assert waits == [("deployments", 1)]